@@ -0,0 +1,273 @@
+"""
+Multi-session advisor service.
+
+An asyncio TCP server on localhost speaking newline-delimited JSON. Each
+session has its own deck count, rules and count tracker, so one process can
+follow many tables at once. Any connection can address any session by id.
+
+Requests (one JSON object per line; 'id' is echoed back if given):
+    {"op": "open", "decks": 6, "rules": {"s17": true}}    -> {"ok": true, "session": "..."}
+    {"op": "cards", "session": "...", "cards": "10 A 5"}  -> count status
+    {"op": "advise", "session": "...", "player": "A 6", "upcard": "10"}
+    {"op": "status" | "undo" | "reset" | "close", "session": "..."}
+    {"op": "rules", "session": "...", "rules": {"das": false}}
+    {"op": "metrics", "format": "json" | "prometheus"}    (needs --metrics)
+
+Errors come back as {"ok": false, "error": "..."}.
+
+Usage:
+    python advisor_service.py --port 8765
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import blackjack_advisor as ba
+
+DEFAULT_RULES = {'s17': True, 'das': True, 'surrender': True}
+DEFAULT_PORT = 8765
+# Undo steps kept per session.
+HISTORY_SIZE = 64
+# Longest request line accepted, in bytes.
+MAX_LINE = 64 * 1024
+
+class Session:
+    __slots__ = ('tracker', 'rules')
+
+    def __init__(self, num_decks, rules):
+        self.tracker = ba.CountTracker(num_decks, max_history=HISTORY_SIZE)
+        self.rules = rules
+
+    def status(self):
+        tracker = self.tracker
+        return {
+            'running_count': tracker.running_count,
+            'true_count': round(tracker.true_count, 2),
+            'cards_seen': tracker.cards_seen,
+            'decks_remaining': round(tracker.decks_remaining, 2),
+        }
+
+def _card_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value)
+
+def _parse_rules(value, base):
+    if value is None:
+        return dict(base)
+    if not isinstance(value, dict):
+        raise ValueError("rules must be an object")
+    unknown = set(value) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"unknown rules: {', '.join(sorted(unknown))}")
+    for k, v in value.items():
+        if not isinstance(v, bool):
+            raise ValueError(f"rule {k!r} must be true or false, got {v!r}")
+    return dict(base, **value)
+
+def _session_id(value):
+    # Ids are strings; numbers are accepted and stored as their text.
+    if value is None:
+        raise ValueError("missing session")
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise ValueError(f"session must be a string, got {value!r}")
+    return str(value)
+
+class AdvisorService:
+    """
+    Session table and request dispatch. handle() is synchronous and cheap;
+    the asyncio layer only frames lines and writes replies.
+    """
+
+    def __init__(self, num_decks=6, rules=None, max_sessions=100000):
+        self.num_decks = num_decks
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._ops = {
+            'open': self._open,
+            'close': self._close,
+            'cards': self._cards,
+            'undo': self._undo,
+            'reset': self._reset,
+            'status': self._status,
+            'rules': self._set_rules,
+            'advise': self._advise,
+            'metrics': self._metrics,
+        }
+
+    def handle(self, request):
+        """
+        Answers one request dict. Always returns a reply dict.
+        """
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "request must be a JSON object"}
+        try:
+            name = request.get('op')
+            if not isinstance(name, str):
+                raise ValueError(f"op must be a string, got {name!r}")
+            op = self._ops.get(name)
+            if op is None:
+                raise ValueError(f"unknown op {name!r}")
+            reply = op(request)
+            reply['ok'] = True
+        except (ValueError, TypeError, KeyError, OverflowError) as e:
+            reply = {'ok': False, 'error': str(e.args[0]) if e.args else type(e).__name__}
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    def _session(self, request):
+        sid = _session_id(request.get('session'))
+        session = self.sessions.get(sid)
+        if session is None:
+            raise ValueError(f"no such session {sid!r}")
+        return session
+
+    def _open(self, request):
+        if len(self.sessions) >= self.max_sessions:
+            raise ValueError("too many sessions")
+        decks = int(request.get('decks') or self.num_decks)
+        if decks < 1:
+            raise ValueError("decks must be at least 1")
+        sid = request.get('session')
+        sid = f"s{next(self._ids)}" if sid is None or sid == "" else _session_id(sid)
+        if sid in self.sessions:
+            raise ValueError(f"session {sid!r} already exists")
+        session = self.sessions[sid] = Session(decks, _parse_rules(request.get('rules'), self.rules))
+        reply = session.status()
+        reply['session'] = sid
+        return reply
+
+    def _close(self, request):
+        self._session(request)
+        del self.sessions[_session_id(request['session'])]
+        return {}
+
+    def _cards(self, request):
+        session = self._session(request)
+        text = _card_text(request.get('cards'))
+        cards = ba.parse_card_codes(text, warn=False)
+        session.tracker.add_many(cards)
+        reply = session.status()
+        ignored = len(text.split()) - len(cards)
+        if ignored:
+            reply['ignored'] = ignored
+        return reply
+
+    def _undo(self, request):
+        session = self._session(request)
+        undone = session.tracker.undo()
+        reply = session.status()
+        reply['undone'] = undone
+        return reply
+
+    def _reset(self, request):
+        session = self._session(request)
+        session.tracker.reset()
+        return session.status()
+
+    def _status(self, request):
+        return self._session(request).status()
+
+    def _set_rules(self, request):
+        session = self._session(request)
+        session.rules = _parse_rules(request.get('rules'), session.rules)
+        return {'rules': session.rules}
+
+    def _advise(self, request):
+        session = self._session(request)
+        player = ba.parse_card_codes(_card_text(request.get('player')), warn=False)
+        upcard = ba.parse_card_codes(_card_text(request.get('upcard')), warn=False)
+        if len(player) < 2:
+            raise ValueError("player hand needs at least 2 cards")
+        if len(upcard) != 1:
+            raise ValueError("upcard needs exactly 1 card")
+        true_count = session.tracker.true_count
+        basic = ba.lookup_basic_strategy(player, upcard[0], session.rules)
+        action, reason = ba.apply_deviations(basic, player, upcard[0], true_count, session.rules)
+        reply = session.status()
+        reply['action'] = action
+        reply['basic'] = basic
+        reply['deviation'] = action != basic
+        reply['reason'] = reason
+        if upcard[0] == ba.ACE:
+            reply['insurance'] = true_count >= 3
+        return reply
+
+    def _metrics(self, request):
+        import metrics
+        if request.get('format') == 'prometheus':
+            return {'metrics': metrics.to_prometheus()}
+        return {'metrics': metrics.snapshot(), 'sessions': len(self.sessions)}
+
+    # -----------------------------------------------------------------------
+    # Network layer
+    # -----------------------------------------------------------------------
+
+    async def serve_client(self, reader, writer):
+        loads, dumps, handle = json.loads, json.dumps, self.handle
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"ok": false, "error": "request line too long"}\n')
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = loads(line)
+                except ValueError as e:
+                    reply = {'ok': False, 'error': f"invalid JSON: {e}"}
+                else:
+                    reply = handle(request)
+                writer.write(dumps(reply).encode() + b"\n")
+                # Only wait on the socket when the client falls behind.
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.serve_client, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the multi-session advisor service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-d", "--decks", type=int, default=6, help="Default decks for new sessions")
+    parser.add_argument("--max-sessions", type=int, default=100000)
+    parser.add_argument("--metrics", action="store_true", help="Collect hot-path metrics (op 'metrics')")
+    parser.add_argument("--metrics-port", type=int, help="Also serve Prometheus /metrics on this port")
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    args = parser.parse_args(argv)
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    service = AdvisorService(args.decks, rules, args.max_sessions)
+    if args.metrics or args.metrics_port:
+        import metrics
+        metrics.enable()
+        if args.metrics_port:
+            metrics.serve(args.metrics_port, args.host)
+    print(f"Advisor service listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
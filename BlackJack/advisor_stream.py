@@ -0,0 +1,187 @@
+"""
+Non-interactive streaming advisor for hand/shoe logs.
+
+Reads JSONL or CSV records from a file or stdin, one record at a time, and
+writes one result per record. Each stage is a generator, so memory stays flat
+however large the log is.
+
+Record fields (all optional):
+    shoe      - shoe id; the count resets whenever it changes
+    decks     - decks in the shoe (default --decks)
+    seen      - cards to add to the count, e.g. "10 A 5" (or a JSON list)
+    player    - player hand to advise on, e.g. "A 6"
+    upcard    - dealer upcard
+    rules     - JSON object like the CLI rules dict; in CSV use s17/das/surrender columns
+
+Usage:
+    python advisor_stream.py hands.jsonl > advice.jsonl
+    cat hands.csv | python advisor_stream.py --format csv --output-format csv
+"""
+import argparse
+import csv
+import json
+import sys
+import blackjack_advisor as ba
+
+DEFAULT_RULES = {'s17': True, 'das': True, 'surrender': True}
+
+OUTPUT_FIELDS = ['record', 'shoe', 'action', 'basic', 'deviation', 'reason',
+                 'running_count', 'true_count', 'cards_seen', 'decks_remaining',
+                 'ignored', 'error']
+
+_TRUE_STRINGS = {'1', 'true', 't', 'yes', 'y'}
+
+def _card_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return str(value)
+
+def _flag(value, default):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _TRUE_STRINGS
+
+def read_jsonl(lines):
+    loads = json.loads
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield loads(line)
+            except json.JSONDecodeError as e:
+                # One malformed line should not end the whole stream.
+                yield {'_error': f"invalid JSON: {e}"}
+
+def read_csv(lines):
+    for row in csv.DictReader(lines):
+        rules = {}
+        for key in ('s17', 'das', 'surrender'):
+            if row.get(key) not in (None, ""):
+                rules[key] = _flag(row.pop(key), DEFAULT_RULES[key])
+        if rules:
+            row['rules'] = rules
+        yield row
+
+def advise_records(records, num_decks=6, base_rules=None, reasons=False):
+    """
+    Turns a stream of record dicts into a stream of result dicts.
+    """
+    base_rules = dict(DEFAULT_RULES if base_rules is None else base_rules)
+    tracker = None
+    shoe = None
+
+    for n, record in enumerate(records, 1):
+        result = {'record': n}
+        try:
+            if not isinstance(record, dict):
+                raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+            if '_error' in record:
+                result['error'] = record['_error']
+                yield result
+                continue
+            decks = int(record.get('decks') or num_decks)
+            record_shoe = record.get('shoe')
+            if tracker is None or record_shoe != shoe or decks != tracker.num_decks:
+                # The stream never undoes, so keep no history.
+                tracker = ba.CountTracker(decks, max_history=0)
+                shoe = record_shoe
+            if shoe is not None:
+                result['shoe'] = shoe
+
+            seen_text = _card_text(record.get('seen'))
+            seen = ba.parse_card_codes(seen_text, warn=False)
+            ignored = len(seen_text.split()) - len(seen)
+            tracker.add_many(seen)
+
+            player_text = _card_text(record.get('player'))
+            upcard_text = _card_text(record.get('upcard'))
+            if player_text or upcard_text:
+                player = ba.parse_card_codes(player_text, warn=False)
+                upcard = ba.parse_card_codes(upcard_text, warn=False)
+                ignored += len(player_text.split()) - len(player)
+                ignored += len(upcard_text.split()) - len(upcard)
+                if len(player) < 2:
+                    raise ValueError("player hand needs at least 2 cards")
+                if len(upcard) != 1:
+                    raise ValueError("upcard needs exactly 1 card")
+                rules = record.get('rules') or {}
+                if rules:
+                    rules = dict(base_rules, **rules)
+                else:
+                    rules = base_rules
+                true_count = tracker.true_count
+                basic = ba.lookup_basic_strategy(player, upcard[0], rules)
+                action, reason = ba.apply_deviations(basic, player, upcard[0], true_count, rules)
+                result['action'] = action
+                result['basic'] = basic
+                result['deviation'] = action != basic
+                if reasons:
+                    result['reason'] = reason
+
+            result['running_count'] = tracker.running_count
+            result['true_count'] = round(tracker.true_count, 2)
+            result['cards_seen'] = tracker.cards_seen
+            result['decks_remaining'] = round(tracker.decks_remaining, 2)
+            if ignored:
+                result['ignored'] = ignored
+        except (ValueError, TypeError, AttributeError) as e:
+            result['error'] = str(e)
+        yield result
+
+def write_jsonl(results, out):
+    dumps = json.dumps
+    write = out.write
+    for result in results:
+        write(dumps(result))
+        write("\n")
+
+def write_csv(results, out):
+    writer = csv.DictWriter(out, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(results)
+
+def run(infile, outfile, in_format="jsonl", out_format="jsonl", num_decks=6, rules=None, reasons=False):
+    """
+    Runs the full read -> advise -> write pipeline.
+    """
+    records = read_csv(infile) if in_format == "csv" else read_jsonl(infile)
+    results = advise_records(records, num_decks, rules, reasons)
+    if out_format == "csv":
+        write_csv(results, outfile)
+    else:
+        write_jsonl(results, outfile)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream advice for a JSONL/CSV hand log.")
+    parser.add_argument("input", nargs="?", default="-", help="Log file (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from extension, else jsonl)")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    parser.add_argument("--reasons", action="store_true", help="Include the explanation text")
+    args = parser.parse_args(argv)
+
+    in_format = args.format
+    if in_format is None:
+        in_format = "csv" if args.input.lower().endswith(".csv") else "jsonl"
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+
+    infile = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        run(infile, outfile, in_format, args.output_format, args.decks, rules, args.reasons)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Vectorized batch decisions for large logs of hands.
+
+Hands are encoded as a 2-D int8 array of card values (2-10, Ace=11) padded
+with 0, one row per hand. Dealer upcards use the same values. Every row is
+scored in one pass against the compiled strategy table from
+blackjack_advisor, then the count deviations are applied with array masks.
+The answers match lookup_basic_strategy / apply_deviations row for row.
+"""
+import numpy as np
+import blackjack_advisor as ba
+
+ACTIONS = ("HIT", "STAND", "DOUBLE", "SPLIT", "SURRENDER")
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+INVALID = -1
+
+_np_tables = {}
+
+def encode_cards(cards):
+    """
+    Encodes a list of card strings as an int8 array of card values.
+    """
+    return np.array([ba._CARD_VALUES[c] for c in cards], dtype=np.int8)
+
+def encode_hands(hands, max_cards=None):
+    """
+    Encodes a list of hands (lists of card strings) as a zero-padded
+    (n, max_cards) int8 array of card values.
+    """
+    if max_cards is None:
+        max_cards = max((len(h) for h in hands), default=2)
+    out = np.zeros((len(hands), max_cards), dtype=np.int8)
+    for row, hand in enumerate(hands):
+        out[row, :len(hand)] = [ba._CARD_VALUES[c] for c in hand]
+    return out
+
+def decode_actions(codes):
+    """
+    Converts an array of action codes back to action strings.
+    Invalid rows come back as None.
+    """
+    names = np.array(ACTIONS + (None,), dtype=object)
+    return names[np.asarray(codes)]
+
+def get_action_table(rules):
+    """
+    Returns the compiled strategy table for a rules dict as an int8 array
+    of action codes (INVALID for unreachable cells).
+    """
+    key = ba.rules_key(rules)
+    table = _np_tables.get(key)
+    if table is None:
+        table = np.array([INVALID if a is None else ACTION_CODES[a]
+                          for a in ba.get_strategy_table(rules)], dtype=np.int8)
+        _np_tables[key] = table
+    return table
+
+def classify_hands(hands):
+    """
+    Vectorized calculate_hand / hand_key for an encoded hand array.
+    Returns (total, is_soft, is_pair, n_cards) arrays.
+    """
+    hands = np.asarray(hands)
+    values = hands.astype(np.int16)
+    n_cards = np.count_nonzero(hands, axis=1)
+    total = values.sum(axis=1)
+    aces = np.count_nonzero(hands == 11, axis=1)
+
+    # Each demoted ace is worth 10 less; demote as few as needed to reach 21.
+    over = np.maximum(total - 21, 0)
+    demoted = np.minimum(aces, (over + 9) // 10)
+    total = total - 10 * demoted
+    is_soft = aces > demoted
+
+    is_pair = (n_cards == 2) & (values[:, 0] == values[:, 1])
+    return total, is_soft, is_pair, n_cards
+
+def batch_basic_strategy(hands, upcards, rules):
+    """
+    Basic strategy for every row of an encoded hand array.
+    Returns an int8 array of action codes.
+    """
+    total, is_soft, is_pair, n_cards = classify_hands(hands)
+    upcards = np.asarray(upcards).astype(np.int32)
+
+    can_double = (n_cards == 2).astype(np.int32)
+    hand_class = np.where(is_pair, ba.HAND_PAIR, np.where(is_soft, ba.HAND_SOFT, ba.HAND_HARD))
+    key_total = np.where(is_pair, np.asarray(hands)[:, 0], np.minimum(total, ba.TABLE_MAX_TOTAL))
+
+    idx = ((hand_class * (ba.TABLE_MAX_TOTAL + 1) + key_total) * 12 + upcards) * 2 + can_double
+    actions = get_action_table(rules)[idx]
+    actions[n_cards < 2] = INVALID
+    return actions
+
+def batch_apply_deviations(basic_actions, hands, upcards, true_counts, rules, plays=None):
+    """
+    Applies an index set (default ba.DEVIATIONS) to a batch of basic
+    strategy codes. Returns (final action codes, deviation flags) where a
+    flag is set when the final action differs from basic strategy.
+    """
+    if plays is None:
+        plays = ba.DEVIATIONS
+    hands = np.asarray(hands)
+    total, is_soft, is_pair, n_cards = classify_hands(hands)
+    upcards = np.asarray(upcards)
+    true_counts = np.asarray(true_counts, dtype=np.float64)
+    basic_actions = np.asarray(basic_actions)
+    hand_class = np.where(is_soft, ba.HAND_SOFT, ba.HAND_HARD)
+
+    final = basic_actions.copy()
+    # apply_deviations takes the first play that fires for a hand, trying
+    # pair plays before hard/soft ones; 'decided' keeps that priority here.
+    decided = basic_actions == INVALID
+    ordered = ([p for p in plays if p.hand_class == ba.HAND_PAIR] +
+               [p for p in plays if p.hand_class != ba.HAND_PAIR])
+    for play in ordered:
+        if not ba.play_applies_to_rules(play, rules):
+            continue
+        if play.hand_class == ba.HAND_PAIR:
+            mask = is_pair & (hands[:, 0] == play.total)
+        else:
+            mask = (hand_class == play.hand_class) & (total == play.total)
+        mask &= (upcards == play.upcard) & ~decided
+        if play.only_from is not None:
+            mask &= basic_actions == ACTION_CODES[play.only_from]
+        if play.initial_only:
+            mask &= n_cards == 2
+        if play.direction == 'below':
+            mask &= true_counts < play.index
+        else:
+            mask &= true_counts >= play.index
+        final[mask] = ACTION_CODES[play.action]
+        decided |= mask
+    return final, final != basic_actions
+
+def batch_decide(hands, upcards, true_counts, rules, with_flags=False, plays=None):
+    """
+    Scores a whole batch of decisions in one vectorized pass.
+    Returns an int8 array of action codes, plus the deviation flags
+    when with_flags is set.
+    """
+    basic = batch_basic_strategy(hands, upcards, rules)
+    final, flags = batch_apply_deviations(basic, hands, upcards, true_counts, rules, plays)
+    if with_flags:
+        return final, flags
+    return final
@@ -0,0 +1,265 @@
+"""
+Benchmarks for the advisor hot paths.
+
+Each case times one function on a fixed input and reports nanoseconds per
+call and calls per second (median of several repeats). Every repeat of a
+case is paired with a repeat of a fixed pure-Python reference loop timed
+right before it, and the median ratio of the two is stored as the case's
+relative cost. The gate compares relative costs, not nanoseconds, so a
+machine that is slower overall (or busy for a while) does not show up as
+a regression; any case whose relative cost grows by more than the
+tolerance is reported and the exit status is 1.
+
+Re-record the baseline in a commit of its own, never together with a code
+change, or the gate never sees that change.
+
+Usage:
+    python benchmark.py                      # run, write bench_results.json, compare
+    python benchmark.py --save-baseline      # record this machine's numbers
+    python benchmark.py --filter strategy    # only cases whose name contains 'strategy'
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import blackjack_advisor as ba
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+DEFAULT_OUTPUT = "bench_results.json"
+
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+
+ALL_RULES = [{'s17': s17, 'das': das, 'surrender': surrender}
+             for s17 in (True, False) for das in (True, False) for surrender in (True, False)]
+
+# Representative hands plus worst cases: long soft hands that demote aces
+# several times and walk the whole if/elif chain.
+HANDS = {
+    'hard': (['10', '6'], '10'),
+    'soft': (['A', '7'], '9'),
+    'pair': (['8', '8'], 'A'),
+    'long_soft': (['A', 'A', 'A', '2', 'A', '3', '2'], '10'),
+}
+
+def _shuffled_shoe(num_decks, seed=7):
+    shoe = RANKS * 4 * num_decks
+    random.Random(seed).shuffle(shoe)
+    return shoe
+
+def _cycle(items):
+    # Cheap round-robin over a fixed list so every rule set gets exercised.
+    items = list(items)
+    n = len(items)
+    state = [0]
+
+    def next_item():
+        i = state[0]
+        state[0] = i + 1 if i + 1 < n else 0
+        return items[i]
+    return next_item
+
+_REFERENCE_DATA = list(range(256))
+
+def reference_loop():
+    # Fixed interpreter work (loop, index, arithmetic) independent of the
+    # advisor; every case is measured relative to it.
+    total = 0
+    for x in _REFERENCE_DATA:
+        total += x & 7
+    return total
+
+def build_cases():
+    """
+    Returns a list of (name, function, calls per function call).
+    """
+    cases = []
+
+    cases.append(("parse_cards/short", lambda: ba.parse_cards("10 A 5"), 1))
+    long_line = " ".join(_shuffled_shoe(1))
+    cases.append(("parse_cards/deck_line", lambda: ba.parse_cards(long_line, warn=False), 1))
+
+    cases.append(("parse_card_codes/deck_line", lambda: ba.parse_card_codes(long_line, warn=False), 1))
+
+    cases.append(("get_card_value/face", lambda: ba.get_card_value('K'), 1))
+    cases.append(("get_card_value/digit", lambda: ba.get_card_value('7'), 1))
+    cases.append(("get_card_value/code", lambda: ba.get_card_value(10), 1))
+
+    for label, (hand, _) in HANDS.items():
+        cases.append((f"calculate_hand/{label}", lambda h=hand: ba.calculate_hand(h), 1))
+    for label, (hand, _) in HANDS.items():
+        encoded = ba.encode_cards(hand)
+        cases.append((f"calculate_hand/{label}_encoded", lambda h=encoded: ba.calculate_hand(h), 1))
+
+    for label, (hand, up) in HANDS.items():
+        cases.append((f"get_basic_strategy/{label}",
+                      lambda h=hand, u=up: ba.get_basic_strategy(h, u, ALL_RULES[0]), 1))
+        cases.append((f"lookup_basic_strategy/{label}",
+                      lambda h=hand, u=up: ba.lookup_basic_strategy(h, u, ALL_RULES[0]), 1))
+
+    for label, (hand, up) in HANDS.items():
+        encoded, up_code = ba.encode_cards(hand), ba.encode_cards([up])[0]
+        cases.append((f"lookup_basic_strategy/{label}_encoded",
+                      lambda h=encoded, u=up_code: ba.lookup_basic_strategy(h, u, ALL_RULES[0]), 1))
+
+    next_rules = _cycle(ALL_RULES)
+    hand, up = HANDS['long_soft']
+    cases.append(("get_basic_strategy/all_rules",
+                  lambda: ba.get_basic_strategy(hand, up, next_rules()), 1))
+    cases.append(("lookup_basic_strategy/all_rules",
+                  lambda: ba.lookup_basic_strategy(hand, up, next_rules()), 1))
+
+    cases.append(("apply_deviations/hit",
+                  lambda: ba.apply_deviations("HIT", ['10', '6'], '10', 1.5, ALL_RULES[0]), 1))
+    cases.append(("apply_deviations/none",
+                  lambda: ba.apply_deviations("STAND", ['10', '9'], '6', -1.0, ALL_RULES[0]), 1))
+
+    # Count a whole 6-deck shoe one card at a time and ask for advice after
+    # every 5 cards, the way the GUI is driven at the table.
+    shoe = _shuffled_shoe(6)
+    rules = ALL_RULES[0]
+
+    def shoe_loop():
+        tracker = ba.CountTracker(6)
+        add = tracker.add
+        for i in range(0, len(shoe) - 4, 5):
+            for card in shoe[i:i + 5]:
+                add(card)
+            player = shoe[i:i + 2]
+            basic = ba.lookup_basic_strategy(player, shoe[i + 2], rules)
+            ba.apply_deviations(basic, player, shoe[i + 2], tracker.true_count, rules)
+    cases.append(("shoe_loop/count_and_advise", shoe_loop, len(shoe) // 5))
+
+    def shoe_bulk():
+        tracker = ba.CountTracker(6)
+        tracker.add_many(shoe)
+        return tracker.true_count
+    cases.append(("shoe_loop/bulk_count", shoe_bulk, 1))
+
+    encoded_shoe = ba.encode_cards(shoe)
+
+    def shoe_bulk_encoded():
+        tracker = ba.CountTracker(6)
+        tracker.add_many(encoded_shoe)
+        return tracker.true_count
+    cases.append(("shoe_loop/bulk_count_encoded", shoe_bulk_encoded, 1))
+
+    return cases
+
+def _calibrate(func, target):
+    # Inner loop count so one timing of func runs for about target seconds.
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target:
+            return number
+        number *= 2 if elapsed == 0 else max(2, int(target / elapsed) + 1)
+
+def _timed(func, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+def time_case(func, min_time=0.2, repeats=7, warmup=16):
+    """
+    Returns (median seconds per call, median ratio to reference_loop) over
+    several repeats, each timed right after a repeat of the reference.
+    """
+    # Warm up first so one-off work (compiling strategy tables for every
+    # rule set, filling caches) is not timed as steady-state cost.
+    for _ in range(warmup):
+        func()
+    number = _calibrate(func, min_time / repeats)
+    ref_number = _calibrate(reference_loop, min_time / repeats / 2)
+
+    times, ratios = [], []
+    for _ in range(repeats):
+        ref = _timed(reference_loop, ref_number)
+        t = _timed(func, number)
+        times.append(t)
+        ratios.append(t / ref)
+    return statistics.median(times), statistics.median(ratios)
+
+def run(name_filter=None, min_time=0.2):
+    results = {}
+    for name, func, ops in build_cases():
+        if name_filter and name_filter not in name:
+            continue
+        per_call, relative = time_case(func, min_time)
+        per_call /= ops
+        results[name] = {'ns_per_op': per_call * 1e9, 'ops_per_sec': 1.0 / per_call,
+                         'relative': relative / ops}
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+def compare(current, baseline, tolerance):
+    """
+    Returns a list of (name, baseline, current, ratio) for cases slower than
+    the baseline by more than tolerance (0.3 = 30%). Costs relative to the
+    reference loop are compared; a baseline without them falls back to ns.
+    """
+    regressions = []
+    base = baseline.get('results', {})
+    for name, result in current['results'].items():
+        if name not in base:
+            continue
+        key = 'relative' if 'relative' in base[name] else 'ns_per_op'
+        ratio = result[key] / base[name][key]
+        if ratio > 1.0 + tolerance:
+            regressions.append((name, base[name][key], result[key], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the advisor hot paths.")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="Results file (JSON)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    # Repeat runs of unchanged code stay within about 10-20% of each other
+    # relative to the reference loop (30-90% in absolute ns on a busy machine).
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed relative slowdown (default 0.3 = 30%%)")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case")
+    args = parser.parse_args(argv)
+
+    current = run(args.filter, args.min_time)
+    for name, result in current['results'].items():
+        print(f" {name:<36}: {result['ns_per_op']:>12.0f} ns/op {result['ops_per_sec']:>14,.0f} ops/s "
+              f"{result['relative']:>9.3f} x ref")
+
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for name, base, cur, ratio in regressions:
+            print(f" {name:<36}: {base:.3f} -> {cur:.3f} ({ratio:.2f}x)")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
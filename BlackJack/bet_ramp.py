@@ -0,0 +1,215 @@
+"""
+Kelly bet-ramp optimizer.
+
+Simulates shoes at a flat 1-unit bet, buckets every round by its starting
+true count, and turns the per-bucket EV and variance into a fractional-Kelly
+bet for each count. EV is smoothed with a weighted straight-line fit across
+buckets, since the extreme counts see few rounds.
+
+Ramps are cached per configuration, in memory and in a JSON file in the
+cache directory ($BLACKJACK_CACHE_DIR, default ~/.cache/blackjack-advisor),
+so switching tables is a cache hit rather than a new simulation.
+"""
+import json
+import math
+import os
+from bisect import bisect_right
+import blackjack_advisor as ba
+import simulator
+
+CACHE_DIR = os.environ.get("BLACKJACK_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "blackjack-advisor"))
+RAMP_CACHE_FILE = "bet_ramps.json"
+
+# Bucket b holds rounds that started at b <= TC < b + 1.
+MIN_BUCKET = -5
+MAX_BUCKET = 10
+
+_ramps = {}
+
+class BetRamp:
+    """
+    Step function from true count to bet units: units[i] applies below
+    thresholds[i], and units[-1] from the last threshold up.
+    """
+    __slots__ = ('thresholds', 'units')
+
+    def __init__(self, thresholds, units):
+        if len(units) != len(thresholds) + 1:
+            raise ValueError("a ramp needs one more unit step than thresholds")
+        self.thresholds = tuple(thresholds)
+        self.units = tuple(units)
+
+    def units_for(self, true_count):
+        return self.units[bisect_right(self.thresholds, true_count)]
+
+    __call__ = units_for
+
+    @property
+    def spread(self):
+        return self.units[-1] / self.units[0]
+
+    def describe(self):
+        """
+        Returns lines like 'TC < 1.5: 1 unit(s)'.
+        """
+        lines = []
+        for i, units in enumerate(self.units):
+            if i == 0:
+                label = f"TC < {self.thresholds[0]:g}" if self.thresholds else "Any TC"
+            else:
+                label = f"TC >= {self.thresholds[i - 1]:g}"
+            lines.append(f"{label}: {units} unit(s)")
+        return lines
+
+    def to_dict(self):
+        return {'thresholds': list(self.thresholds), 'units': list(self.units)}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['thresholds'], d['units'])
+
+# The fixed 1-5 unit Hi-Lo ramp the GUI has always used.
+DEFAULT_RAMP = BetRamp((1.5, 2.5, 3.5, 4.5), (1, 2, 3, 4, 5))
+
+def true_count_histogram(rules, num_decks=6, penetration=0.75, rounds=300000, seed=1):
+    """
+    Simulates flat-bet play and returns {bucket: (rounds, mean, variance)}.
+    """
+    sums = {}
+
+    def on_round(tc, bet, won):
+        b = math.floor(tc)
+        if b < MIN_BUCKET:
+            b = MIN_BUCKET
+        elif b > MAX_BUCKET:
+            b = MAX_BUCKET
+        s = sums.get(b)
+        if s is None:
+            s = sums[b] = [0, 0.0, 0.0]
+        s[0] += 1
+        s[1] += won
+        s[2] += won * won
+
+    simulator.simulate(rounds, rules, num_decks=num_decks, penetration=penetration,
+                       seed=seed, on_round=on_round)
+    histogram = {}
+    for b, (n, total, total_sq) in sorted(sums.items()):
+        mean = total / n
+        var = (total_sq - n * mean * mean) / (n - 1) if n > 1 else 0.0
+        histogram[b] = (n, mean, var)
+    return histogram
+
+def _fit_line(histogram):
+    # Weighted least squares of EV against the bucket centre.
+    sw = sx = sy = sxx = sxy = 0.0
+    for b, (n, mean, _) in histogram.items():
+        x = b + 0.5
+        sw += n
+        sx += n * x
+        sy += n * mean
+        sxx += n * x * x
+        sxy += n * x * mean
+    denom = sw * sxx - sx * sx
+    if not denom:
+        return sy / sw if sw else 0.0, 0.0
+    slope = (sw * sxy - sx * sy) / denom
+    return (sy - slope * sx) / sw, slope
+
+def optimal_ramp(histogram, bankroll, kelly_fraction=0.5, min_units=1, max_units=12,
+                 min_bucket_rounds=2000):
+    """
+    Turns a true-count histogram into a fractional-Kelly ramp, in whole
+    units between min_units and max_units and never decreasing with the count.
+    """
+    intercept, slope = _fit_line(histogram)
+    total_n = sum(n for n, _, _ in histogram.values())
+    pooled_var = sum(n * var for n, _, var in histogram.values()) / total_n if total_n else 1.3
+
+    thresholds = []
+    units = [min_units]
+    for b in range(MIN_BUCKET, MAX_BUCKET + 1):
+        ev = intercept + slope * (b + 0.5)
+        n, _, var = histogram.get(b, (0, 0.0, 0.0))
+        if n < min_bucket_rounds or var <= 0:
+            var = pooled_var
+        bet = 0 if ev <= 0 else int(bankroll * kelly_fraction * ev / var)
+        bet = max(min_units, min(max_units, bet))
+        if bet > units[-1]:
+            thresholds.append(b)
+            units.append(bet)
+    return BetRamp(thresholds, units)
+
+def _config_key(rules, num_decks, penetration, bankroll, kelly_fraction, max_units, rounds, seed):
+    s17, das, surrender = ba.rules_key(rules)
+    return (f"s17={int(s17)},das={int(das)},surrender={int(surrender)},decks={num_decks},"
+            f"pen={penetration:g},bankroll={bankroll:g},kelly={kelly_fraction:g},"
+            f"max={max_units},rounds={rounds},seed={seed}")
+
+def _load_disk_cache():
+    try:
+        with open(os.path.join(CACHE_DIR, RAMP_CACHE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_disk_cache(key, ramp):
+    data = _load_disk_cache()
+    data[key] = ramp.to_dict()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = os.path.join(CACHE_DIR, RAMP_CACHE_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, os.path.join(CACHE_DIR, RAMP_CACHE_FILE))
+    except OSError:
+        pass  # the cache is an optimisation only
+
+def get_ramp(rules, num_decks=6, penetration=0.75, bankroll=1000, kelly_fraction=0.5,
+             max_units=12, rounds=300000, seed=1, compute=True):
+    """
+    Returns the optimal ramp for a table configuration from the cache,
+    simulating it on a miss. With compute=False a miss returns None instead.
+    """
+    key = _config_key(rules, num_decks, penetration, bankroll, kelly_fraction, max_units, rounds, seed)
+    ramp = _ramps.get(key)
+    if ramp is not None:
+        return ramp
+    cached = _load_disk_cache().get(key)
+    if cached is not None:
+        ramp = _ramps[key] = BetRamp.from_dict(cached)
+        return ramp
+    if not compute:
+        return None
+
+    histogram = true_count_histogram(rules, num_decks, penetration, rounds, seed)
+    ramp = _ramps[key] = optimal_ramp(histogram, bankroll, kelly_fraction, max_units=max_units)
+    _save_disk_cache(key, ramp)
+    return ramp
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a fractional-Kelly bet ramp for a table.")
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("-p", "--penetration", type=float, default=0.75)
+    parser.add_argument("-b", "--bankroll", type=float, default=1000, help="Bankroll in betting units")
+    parser.add_argument("-k", "--kelly", type=float, default=0.5, help="Kelly fraction")
+    parser.add_argument("--max-units", type=int, default=12)
+    parser.add_argument("-n", "--rounds", type=int, default=300000)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    histogram = true_count_histogram(rules, args.decks, args.penetration, args.rounds)
+    print(f" {'TC':>4} {'Rounds':>9} {'EV':>8} {'Var':>6}")
+    for b, (n, mean, var) in histogram.items():
+        print(f" {b:>4} {n:>9} {mean * 100:>+7.2f}% {var:>6.3f}")
+    ramp = optimal_ramp(histogram, args.bankroll, args.kelly, max_units=args.max_units)
+    print()
+    for line in ramp.describe():
+        print(" " + line)
+
+if __name__ == "__main__":
+    main()
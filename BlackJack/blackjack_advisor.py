@@ -1,11 +1,72 @@
 import math
+import os
+from array import array
+from collections import deque, namedtuple
+
+# ---------------------------------------------------------------------------
+# Card encoding
+# ---------------------------------------------------------------------------
+# Cards can also be passed around as small-int codes: the card's value,
+# 2-10 for number and face cards and 11 for an Ace. Decisions never need to
+# tell J/Q/K apart, so every ten-valued card shares code 10. Hands encode as
+# bytes (or array('b')) of codes; the functions below accept either form.
+
+ACE = 11
+
+_CARD_VALUES = {
+    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9,
+    '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11,
+    'j': 10, 'q': 10, 'k': 10, 'a': 11,
+}
+# Codes map to themselves so lookups take strings and codes alike.
+_CARD_VALUES.update({v: v for v in range(2, 12)})
+
+# Hi-Lo tag per code, same values as get_hilo_value.
+HILO_TAGS = (0, 0, 1, 1, 1, 1, 1, 0, 0, 0, -1, -1)
+
+_CODE_NAMES = (None, None, '2', '3', '4', '5', '6', '7', '8', '9', '10', 'A')
+
+_ENCODED_TYPES = (bytes, bytearray, array)
+
+def encode_cards(cards):
+    """
+    Encodes a list of card strings (or codes) as bytes of card codes.
+    """
+    return bytes(map(_CARD_VALUES.__getitem__, cards))
+
+def decode_cards(codes):
+    """
+    Returns display strings for a sequence of card codes ('10' for any ten).
+    """
+    return [_CODE_NAMES[c] for c in codes]
+
+def parse_card_codes(input_str, warn=True):
+    """
+    Parses a string of cards separated by spaces straight to card codes.
+    Returns bytes; invalid tokens are skipped like in parse_cards.
+    """
+    get = _CARD_VALUES.get
+    codes = bytearray()
+    for token in input_str.split():
+        code = get(token)
+        if code is None:
+            code = get(token.upper())
+            if code is None:
+                if warn:
+                    print(f"Warning: Ignored invalid token '{token.upper()}'")
+                continue
+        codes.append(code)
+    return bytes(codes)
 
 def get_card_value(card_str):
     """
     Returns the numeric value of a card string for hand totaling.
     Returns 11 for Ace (handling soft/hard logic elsewhere).
     Returns 10 for face cards.
+    Card codes are returned as-is.
     """
+    if isinstance(card_str, int):
+        return card_str if 2 <= card_str <= 11 else None
     card_str = card_str.upper()
     if card_str in ['J', 'Q', 'K', '10']:
         return 10
@@ -24,6 +85,8 @@ def get_hilo_value(card_str):
     7-9: 0
     10, J, Q, K, A: -1
     """
+    if isinstance(card_str, int):
+        return HILO_TAGS[card_str] if 2 <= card_str <= 11 else 0
     card_str = card_str.upper()
     if card_str in ['2', '3', '4', '5', '6']:
         return 1
@@ -33,10 +96,11 @@ def get_hilo_value(card_str):
         return -1
     return 0
 
-def parse_cards(input_str):
+def parse_cards(input_str, warn=True):
     """
     Parses a string of cards separated by spaces.
     Returns a list of valid card strings.
+    Invalid tokens are skipped, with a printed warning unless warn is False.
     """
     tokens = input_str.strip().split()
     valid_cards = []
@@ -44,7 +108,7 @@ def parse_cards(input_str):
         token = token.upper()
         if token in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']:
             valid_cards.append(token)
-        else:
+        elif warn:
             print(f"Warning: Ignored invalid token '{token}'")
     return valid_cards
 
@@ -56,6 +120,15 @@ def calculate_hand(cards):
     if not cards:
         return 0, False, False
     
+    if isinstance(cards, _ENCODED_TYPES):
+        # Encoded hand: the codes are the values.
+        total = sum(cards)
+        aces = cards.count(11)
+        while total > 21 and aces > 0:
+            total -= 10
+            aces -= 1
+        return total, aces > 0, len(cards) == 2 and cards[0] == cards[1]
+
     total = 0
     aces = 0
     for card in cards:
@@ -181,66 +254,414 @@ def get_basic_strategy(player_hand, dealer_upcard, rules):
         
     return "HIT" # Fallback
 
-def apply_deviations(basic_action, player_hand, dealer_upcard, true_count, rules):
+# ---------------------------------------------------------------------------
+# Compiled strategy tables
+# ---------------------------------------------------------------------------
+# get_basic_strategy() above is the reference implementation. Its answer only
+# depends on the hand class (hard/soft/pair), the total (or the pair card),
+# the dealer upcard, whether the hand is still two cards and the rules, so we
+# evaluate it once per cell and keep the answers in a flat list.
+
+HAND_HARD = 0
+HAND_SOFT = 1
+HAND_PAIR = 2
+
+# Hard totals above 21 always STAND, so they share the 21 row.
+TABLE_MAX_TOTAL = 21
+
+# One representative card string per value, used to build sample hands.
+_VALUE_CARDS = {2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 10: '10', 11: 'A'}
+
+_strategy_tables = {}
+
+def rules_key(rules):
+    """
+    Returns a hashable (s17, das, surrender) tuple for a rules dict,
+    using the same defaults as get_basic_strategy.
+    """
+    return (bool(rules.get('s17', True)),
+            bool(rules.get('das', True)),
+            bool(rules.get('surrender', False)))
+
+def table_index(hand_class, total, d_val, can_double):
+    """
+    Returns the flat table index for a (class, total, dealer value, can_double) cell.
+    For pairs, total is the value of one pair card (2-11).
+    """
+    return ((hand_class * (TABLE_MAX_TOTAL + 1) + total) * 12 + d_val) * 2 + can_double
+
+def hand_key(player_hand):
+    """
+    Classifies a hand for table lookup.
+    Returns (hand_class, total, can_double)
+    """
+    if isinstance(player_hand, _ENCODED_TYPES):
+        total = sum(player_hand)
+        aces = player_hand.count(11)
+    else:
+        total = 0
+        aces = 0
+        for card in player_hand:
+            val = _CARD_VALUES[card]
+            total += val
+            if val == 11:
+                aces += 1
+
+    while total > 21 and aces > 0:
+        total -= 10
+        aces -= 1
+
+    if len(player_hand) == 2:
+        first = _CARD_VALUES[player_hand[0]]
+        if first == _CARD_VALUES[player_hand[1]]:
+            return HAND_PAIR, first, 1
+        return (HAND_SOFT if aces else HAND_HARD), total, 1
+
+    if total > TABLE_MAX_TOTAL:
+        total = TABLE_MAX_TOTAL
+    return (HAND_SOFT if aces else HAND_HARD), total, 0
+
+def _sample_hands(max_cards=5):
+    """
+    Yields every multiset of card values with 2..max_cards cards as card strings.
+    Together they reach every cell a real hand can map to.
+    """
+    values = sorted(_VALUE_CARDS)
+
+    def extend(hand, start):
+        if len(hand) >= 2:
+            yield list(hand)
+        if len(hand) == max_cards:
+            return
+        for i in range(start, len(values)):
+            hand.append(_VALUE_CARDS[values[i]])
+            yield from extend(hand, i)
+            hand.pop()
+
+    yield from extend([], 0)
+
+def compile_strategy_table(rules):
+    """
+    Builds the dense decision table for one rule set by evaluating
+    get_basic_strategy on a sample hand for every reachable cell.
+    Unreachable cells are left as None.
+    """
+    table = [None] * table_index(HAND_PAIR + 1, 0, 0, 0)
+    for hand in _sample_hands():
+        hand_class, total, can_double = hand_key(hand)
+        for d_val, d_card in _VALUE_CARDS.items():
+            idx = table_index(hand_class, total, d_val, can_double)
+            action = get_basic_strategy(hand, d_card, rules)
+            if table[idx] is None:
+                table[idx] = action
+            elif table[idx] != action:
+                raise ValueError(f"Strategy cell {hand_class, total, d_val, can_double} is ambiguous")
+    return table
+
+def get_strategy_table(rules):
+    """
+    Returns the compiled table for a rules dict, building it on first use.
+    """
+    key = rules_key(rules)
+    table = _strategy_tables.get(key)
+    if table is None:
+        table = _strategy_tables[key] = compile_strategy_table(rules)
+    return table
+
+def lookup_basic_strategy(player_hand, dealer_upcard, rules):
+    """
+    Same answer as get_basic_strategy, served from the compiled table.
+    Returns: Action string (HIT, STAND, DOUBLE, SPLIT, SURRENDER)
+    """
+    table = get_strategy_table(rules)
+    hand_class, total, can_double = hand_key(player_hand)
+    return table[table_index(hand_class, total, _CARD_VALUES[dealer_upcard], can_double)]
+
+# ---------------------------------------------------------------------------
+# Count deviations (index plays)
+# ---------------------------------------------------------------------------
+# An index play overrides basic strategy for one (hand class, total, upcard)
+# cell once the true count crosses its index:
+#   direction 'above' -> play when TC >= index, 'below' -> play when TC < index
+#   only_from         -> only override this basic action (None = any)
+#   rules             -> (key, value) pairs the table rules must match
+#   initial_only      -> only on the first two cards (surrender plays)
+# For pairs, total is the value of one pair card; pair hands also get the
+# plays for their hard/soft total.
+
+IndexPlay = namedtuple('IndexPlay', 'hand_class total upcard index action only_from direction rules initial_only',
+                       defaults=(None, 'above', (), False))
+
+# The index plays this advisor has always used.
+DEVIATIONS = (
+    IndexPlay(HAND_HARD, 16, 10, 0, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 15, 10, 4, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 12, 3, 2, "STAND"),
+    IndexPlay(HAND_HARD, 12, 2, 3, "STAND"),
+    IndexPlay(HAND_HARD, 10, 10, 4, "DOUBLE"),
+    IndexPlay(HAND_HARD, 11, 11, 1, "DOUBLE"),  # assuming H17/S17 common index
+)
+
+# Defaults for rule conditions, matching get_basic_strategy.
+_RULE_DEFAULTS = {'s17': True, 'das': True, 'surrender': False}
+
+_index_tables = {}
+
+def index_cell(hand_class, total, d_val):
+    """
+    Returns the flat index-table position for a (class, total, dealer value) cell.
+    """
+    return (hand_class * (TABLE_MAX_TOTAL + 1) + total) * 12 + d_val
+
+def play_applies_to_rules(play, rules):
+    """
+    Returns True if every rule condition on an index play holds for rules.
+    """
+    for key, value in play.rules:
+        if bool(rules.get(key, _RULE_DEFAULTS.get(key, False))) != bool(value):
+            return False
+    return True
+
+def compile_index_table(plays, rules):
+    """
+    Builds a list with one tuple of index plays per cell, keeping only the
+    plays whose rule conditions match. Plays keep their listed priority.
+    """
+    table = [()] * index_cell(HAND_PAIR + 1, 0, 0)
+    for play in plays:
+        if play_applies_to_rules(play, rules):
+            idx = index_cell(play.hand_class, play.total, play.upcard)
+            table[idx] = table[idx] + (play,)
+    return table
+
+def get_index_table(rules, plays=None):
+    """
+    Returns the compiled index table for an index set (default DEVIATIONS)
+    under a rules dict, building it on first use.
+    """
+    if plays is None:
+        plays = DEVIATIONS
+    key = (id(plays), rules_key(rules))
+    cached = _index_tables.get(key)
+    if cached is None or cached[0] is not plays:
+        cached = _index_tables[key] = (plays, compile_index_table(plays, rules))
+    return cached[1]
+
+def _cell_label(hand_class, total, d_val):
+    up = 'A' if d_val == 11 else str(d_val)
+    if hand_class == HAND_PAIR:
+        card = 'A' if total == 11 else str(total)
+        return f"{card},{card} vs {up}"
+    if hand_class == HAND_SOFT:
+        return f"soft {total} vs {up}"
+    return f"{total} vs {up}"
+
+_deviation_tables = {}
+
+def compile_deviation_table(plays, rules):
+    """
+    Builds the per-decision index table: one tuple of (play, explanation
+    label) per strategy-table cell (table_index layout, keyed by hand_key
+    and the upcard), in the order apply_deviations tries them. Pair cells
+    also hold the plays for the pair's hard/soft total, and cells without
+    can_double drop initial_only plays.
+    """
+    index_table = compile_index_table(plays, rules)
+    table = [()] * table_index(HAND_PAIR + 1, 0, 0, 0)
+    for d_val in range(2, 12):
+        for hand_class in (HAND_HARD, HAND_SOFT):
+            for total in range(TABLE_MAX_TOTAL + 1):
+                plays_here = index_table[index_cell(hand_class, total, d_val)]
+                for can_double in (0, 1):
+                    table[table_index(hand_class, total, d_val, can_double)] = tuple(
+                        (p, _cell_label(p.hand_class, p.total, d_val))
+                        for p in plays_here if can_double or not p.initial_only)
+        for v in range(2, 12):
+            # A pair of v is hard 2v, or soft 12 for aces.
+            total_cell = (HAND_SOFT, 12) if v == 11 else (HAND_HARD, 2 * v)
+            plays_here = index_table[index_cell(HAND_PAIR, v, d_val)] + index_table[index_cell(*total_cell, d_val)]
+            table[table_index(HAND_PAIR, v, d_val, 1)] = tuple(
+                (p, _cell_label(p.hand_class, p.total, d_val)) for p in plays_here)
+    return table
+
+def get_deviation_table(rules, plays=None):
+    """
+    Returns the compiled deviation table for an index set (default
+    DEVIATIONS) under a rules dict, building it on first use.
+    """
+    if plays is None:
+        key = rules_key(rules)
+        table = _deviation_tables.get(key)
+        if table is None:
+            table = _deviation_tables[key] = compile_deviation_table(DEVIATIONS, rules)
+        return table
+    key = (id(plays),) + rules_key(rules)
+    cached = _deviation_tables.get(key)
+    if cached is None or cached[0] is not plays:
+        cached = _deviation_tables[key] = (plays, compile_deviation_table(plays, rules))
+    return cached[1]
+
+def apply_deviations(basic_action, player_hand, dealer_upcard, true_count, rules, plays=None):
     """
     Checks for specific True Count deviations and overrides Basic Strategy.
+    plays selects the index set (default DEVIATIONS).
     Returns (Final Action, Explanation)
     """
-    p_total, is_soft, is_pair = calculate_hand(player_hand)
-    d_val = get_card_value(dealer_upcard)
-    
-    explanation = f"Basic strategy says {basic_action}."
-    final_action = basic_action
-    
-    # Deviation: 16 vs 10 -> Stand if TC >= 0
-    if p_total == 16 and not is_soft and d_val == 10:
-        if true_count >= 0:
-            if basic_action == "HIT":
-                final_action = "STAND"
-                explanation += f" Deviation applies (16 vs 10, TC {true_count:.1f} >= 0) -> STAND."
+    d_val = _CARD_VALUES.get(dealer_upcard)
+    if d_val is not None:
+        hand_class, total, can_double = hand_key(player_hand)
+        cell = ((hand_class * (TABLE_MAX_TOTAL + 1) + total) * 12 + d_val) * 2 + can_double
+        for play, label in get_deviation_table(rules, plays)[cell]:
+            if play.only_from is not None and basic_action != play.only_from:
+                continue
+            if play.direction == 'below':
+                if true_count >= play.index:
+                    continue
+                op = '<'
+            elif true_count < play.index:
+                continue
+            else:
+                op = '>='
+            explanation = (f"Basic strategy says {basic_action}. Deviation applies "
+                           f"({label}, TC {true_count:.1f} {op} {play.index:g}) -> {play.action}.")
+            if play.action == basic_action:
+                explanation += " No deviation applies."
+            return play.action, explanation
+
+    return basic_action, f"Basic strategy says {basic_action}. No deviation applies."
+
+# ---------------------------------------------------------------------------
+# Count tracking
+# ---------------------------------------------------------------------------
+
+def _tags_by_value(tags_2_to_a):
+    # Tag tuples are indexed by card value (2-10, Ace=11); slots 0 and 1 unused.
+    return (0, 0) + tuple(tags_2_to_a)
+
+COUNT_SYSTEMS = {
+    #                          2  3  4  5  6  7  8  9 10  A
+    'hilo': _tags_by_value(get_hilo_value(c) for c in ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'A']),
+    'ko': _tags_by_value((1, 1, 1, 1, 1, 1, 0, 0, -1, -1)),
+    'hiopt2': _tags_by_value((1, 1, 2, 2, 1, 1, 0, 0, -2, 0)),
+    'omega2': _tags_by_value((1, 1, 2, 2, 2, 1, 0, -1, -2, 0)),
+    'zen': _tags_by_value((1, 1, 2, 2, 2, 1, 0, 0, -2, -1)),
+}
+
+_count_tables = {}
+
+def get_count_tables(system):
+    """
+    Returns (tags by card string, tags by card code, bytes translate table)
+    for a count system, built once and shared by every tracker using it.
+    """
+    tables = _count_tables.get(system)
+    if tables is None:
+        tags = COUNT_SYSTEMS[system]
+        # Separate dicts: CPython looks up all-str-key dicts on a faster path.
+        by_string = {card: tags[v] for card, v in _CARD_VALUES.items() if isinstance(card, str)}
+        by_code = {v: tags[v] for v in range(2, 12)}
+        # Tag + 2 per code, so a bytes shoe is counted with one translate()
+        # and one sum().
+        shifted = bytes(tags[c] + 2 if 2 <= c <= 11 else 2 for c in range(256))
+        tables = _count_tables[system] = (by_string, by_code, shifted)
+    return tables
+
+def initial_running_count(system, num_decks):
+    """
+    Returns the starting running count for a count system.
+    KO is unbalanced and starts at 4 - 4 * decks; the others start at 0.
+    """
+    if system == 'ko':
+        return 4 - 4 * num_decks
+    return 0
+
+class CountTracker:
+    """
+    Running count, cards seen and true count for one shoe.
+    Cards can be given as strings ('10', 'K', 'a') or card codes (2-11);
+    add_many also takes an encoded bytes hand or shoe. Every add (single
+    card or bulk) is one history entry for undo; with max_history set,
+    only that many recent entries are kept.
+    """
+    __slots__ = ('num_decks', 'system', 'running_count', 'cards_seen', 'max_history',
+                 'history', '_tags', '_codes', '_shifted', '_true_count', '_decks_remaining')
+
+    def __init__(self, num_decks=6, system='hilo', max_history=None):
+        self.num_decks = num_decks
+        self.system = system
+        self.max_history = max_history
+        self._tags, self._codes, self._shifted = get_count_tables(system)
+        self.reset()
+
+    def reset(self):
+        self.running_count = initial_running_count(self.system, self.num_decks)
+        self.cards_seen = 0
+        self.history = deque(maxlen=self.max_history)
+        self._true_count = None
+        self._decks_remaining = None
+
+    def add(self, card):
+        """
+        Counts one card. Returns its tag.
+        """
+        tag = self._codes[card] if type(card) is int else self._tags[card]
+        self.running_count += tag
+        self.cards_seen += 1
+        self.history.append((tag, 1))
+        self._true_count = self._decks_remaining = None
+        return tag
+
+    def add_many(self, cards):
+        """
+        Counts a batch of cards in a single pass. Returns the running count change.
+        """
+        n = len(cards)
+        if isinstance(cards, (bytes, bytearray)):
+            delta = sum(cards.translate(self._shifted)) - 2 * n
+        elif n and type(cards[0]) is int:
+            delta = self._sum_tags(self._codes, cards)
         else:
-            if basic_action == "STAND": # Should be HIT by basic
-                pass 
-    
-    # Deviation: 15 vs 10 -> Stand if TC >= 4
-    elif p_total == 15 and not is_soft and d_val == 10:
-        if true_count >= 4:
-            if basic_action == "HIT":
-                final_action = "STAND"
-                explanation += f" Deviation applies (15 vs 10, TC {true_count:.1f} >= 4) -> STAND."
-
-    # Deviation: 12 vs 3 -> Stand if TC >= 2
-    elif p_total == 12 and not is_soft and d_val == 3:
-        if true_count >= 2:
-            final_action = "STAND"
-            explanation += f" Deviation applies (12 vs 3, TC {true_count:.1f} >= 2) -> STAND."
-
-    # Deviation: 12 vs 2 -> Stand if TC >= 3
-    elif p_total == 12 and not is_soft and d_val == 2:
-        if true_count >= 3:
-            final_action = "STAND"
-            explanation += f" Deviation applies (12 vs 2, TC {true_count:.1f} >= 3) -> STAND."
-
-    # Deviation: 10 vs 10 -> Double if TC >= 4
-    elif p_total == 10 and not is_soft and d_val == 10:
-        if true_count >= 4:
-            final_action = "DOUBLE"
-            explanation += f" Deviation applies (10 vs 10, TC {true_count:.1f} >= 4) -> DOUBLE."
-
-    # Deviation: 11 vs A -> Double if TC >= 1 (assuming H17/S17 common index)
-    elif p_total == 11 and not is_soft and d_val == 11:
-        if true_count >= 1:
-            final_action = "DOUBLE"
-            explanation += f" Deviation applies (11 vs A, TC {true_count:.1f} >= 1) -> DOUBLE."
-            
-    # Fab 4 Surrender Deviations (Optional but good for "Advanced")
-    # 15 vs 10 Surrender if TC >= 0? Usually 16 vs 10 is TC >= 0, 15 vs 10 is TC >= 3 or 4.
-    # Keeping it simple to the requested list.
-    
-    if final_action == basic_action:
-        explanation += " No deviation applies."
-        
-    return final_action, explanation
+            delta = self._sum_tags(self._tags, cards)
+        if n:
+            self.running_count += delta
+            self.cards_seen += n
+            self.history.append((delta, n))
+            self._true_count = self._decks_remaining = None
+        return delta
+
+    def _sum_tags(self, tags, cards):
+        try:
+            return sum(map(tags.__getitem__, cards))
+        except KeyError:
+            # Strings and codes mixed in one batch.
+            codes = self._codes
+            return sum(codes[c] if type(c) is int else self._tags[c] for c in cards)
+
+    def undo(self):
+        """
+        Reverts the last add or add_many. Returns False if there is nothing to undo.
+        """
+        if not self.history:
+            return False
+        delta, n = self.history.pop()
+        self.running_count -= delta
+        self.cards_seen -= n
+        self._true_count = self._decks_remaining = None
+        return True
+
+    @property
+    def decks_remaining(self):
+        if self._decks_remaining is None:
+            decks_remaining = self.num_decks - (self.cards_seen / 52.0)
+            if decks_remaining < 0.5: decks_remaining = 0.5 # Avoid division by zero/negative
+            self._decks_remaining = decks_remaining
+        return self._decks_remaining
+
+    @property
+    def true_count(self):
+        if self._true_count is None:
+            self._true_count = self.running_count / self.decks_remaining
+        return self._true_count
 
 def print_separator():
     print("-" * 60)
@@ -250,45 +671,98 @@ def print_header():
     print("             BLACKJACK ADVISOR (Hi-Lo System)")
     print_separator()
 
-def print_status(running_count, cards_seen_total, decks_remaining, true_count):
+def print_status(running_count, cards_seen_total, decks_remaining, true_count, bet_units=None, side_bets=None):
     print("\n" + "="*60)
     print(f" STATUS REPORT")
     print(f" {'Running Count (RC)':<20}: {running_count}")
     print(f" {'True Count (TC)':<20}: {true_count:.1f}")
     print(f" {'Cards Seen':<20}: {cards_seen_total}")
     print(f" {'Decks Remaining':<20}: {decks_remaining:.2f}")
+    if bet_units is not None:
+        print(f" {'Recommended Bet':<20}: {bet_units} unit(s)")
+    if side_bets:
+        print(f" {'Side Bets (EV)':<20}: {side_bets}")
     print("="*60)
 
-def main():
+def main(log_path=None, metrics_path=None, plays=None):
     print_header()
     
-    # 1. Setup
-    print("STEP 1: TABLE CONFIGURATION")
-    try:
-        num_decks = int(input("  Enter number of decks in shoe (default 6): ") or "6")
-    except ValueError:
-        num_decks = 6
-        print("  Invalid input, using 6 decks.")
+    # Strategy tables come from the on-disk chart cache when already built.
+    import sys
+    import charts
+    charts.use_disk_cache(sys.modules[__name__])
+    
+    # Optional instrumentation (see metrics.py); 'stats' prints a snapshot
+    # and metrics_path gets one on exit.
+    if metrics_path:
+        import metrics
+        metrics.enable(module=sys.modules[__name__])
+    
+    # A session log (see session_log.py) records every card and
+    # recommendation, and lets a shoe be picked up again after a restart.
+    # ShoeTracker keeps exact remaining counts for composition-dependent
+    # EV estimates.
+    from composition import ShoeTracker, describe_advice
+    import sidebets
+    log = tracker = None
+    if log_path:
+        import session_log
+        if os.path.exists(log_path):
+            tracker, rules = session_log.replay(log_path, tracker_class=ShoeTracker)
+        if tracker is not None:
+            r_in = input(f"  Resume logged shoe ({tracker.cards_seen} cards seen, RC {tracker.running_count})? (Y/n): ").lower()
+            if r_in == 'n':
+                tracker = None
+            else:
+                num_decks = tracker.num_decks
+        log = session_log.SessionLog(log_path)
+    
+    if tracker is None:
+        # 1. Setup
+        print("STEP 1: TABLE CONFIGURATION")
+        try:
+            num_decks = int(input("  Enter number of decks in shoe (default 6): ") or "6")
+        except ValueError:
+            num_decks = 6
+            print("  Invalid input, using 6 decks.")
         
-    # Rules setup
-    print("\nSTEP 2: RULES CONFIGURATION (Press Enter for defaults)")
-    rules = {
-        's17': True, # Dealer stands on soft 17
-        'das': True, # Double after split allowed
-        'surrender': True # Late surrender allowed
-    }
+        # Rules setup
+        print("\nSTEP 2: RULES CONFIGURATION (Press Enter for defaults)")
+        rules = {
+            's17': True, # Dealer stands on soft 17
+            'das': True, # Double after split allowed
+            'surrender': True # Late surrender allowed
+        }
     
-    r_in = input("  Dealer hits soft 17? (y/N): ").lower()
-    if r_in == 'y': rules['s17'] = False # H17
+        r_in = input("  Dealer hits soft 17? (y/N): ").lower()
+        if r_in == 'y': rules['s17'] = False # H17
     
-    r_in = input("  Double after split allowed? (Y/n): ").lower()
-    if r_in == 'n': rules['das'] = False
+        r_in = input("  Double after split allowed? (Y/n): ").lower()
+        if r_in == 'n': rules['das'] = False
     
-    r_in = input("  Surrender allowed? (Y/n): ").lower()
-    if r_in == 'n': rules['surrender'] = False
+        r_in = input("  Surrender allowed? (Y/n): ").lower()
+        if r_in == 'n': rules['surrender'] = False
     
-    running_count = 0
-    cards_seen_total = 0
+    try:
+        bankroll = float(input("  Bankroll in betting units (default 1000): ") or "1000")
+    except ValueError:
+        bankroll = 1000
+        print("  Invalid input, using 1000 units.")
+    
+    # Imported here: bet_ramp builds on this module through the simulator.
+    import bet_ramp
+    ramp = bet_ramp.get_ramp(rules, num_decks, bankroll=bankroll, compute=False)
+    if ramp is None:
+        print("\n  Optimizing bet ramp for this table (cached for next time)...")
+        ramp = bet_ramp.get_ramp(rules, num_decks, bankroll=bankroll)
+    print("\n  Bet ramp:")
+    for line in ramp.describe():
+        print(f"    {line}")
+    
+    if tracker is None:
+        tracker = ShoeTracker(num_decks)
+        if log:
+            log.shoe(num_decks, rules)
     
     print("\n" + "*"*60)
     print(" SESSION STARTED")
@@ -296,62 +770,94 @@ def main():
     print("  - Enter cards seen (e.g., '10 A 5') to update count.")
     print("  - Type 'rec' to get a move recommendation.")
     print("  - Type 'reset' when the shoe is shuffled.")
+    print("  - Type 'chart' to show the strategy chart for these rules.")
+    if metrics_path:
+        print("  - Type 'stats' to show hot-path metrics.")
     print("  - Type 'quit' to exit.")
     print("*"*60)
     
     while True:
-        # Calculate True Count
-        decks_remaining = num_decks - (cards_seen_total / 52.0)
-        if decks_remaining < 0.5: decks_remaining = 0.5 # Avoid division by zero/negative
+        true_count = tracker.true_count
         
-        true_count = running_count / decks_remaining
-        
-        print_status(running_count, cards_seen_total, decks_remaining, true_count)
+        print_status(tracker.running_count, tracker.cards_seen, tracker.decks_remaining, true_count,
+                     ramp.units_for(true_count), sidebets.describe(sidebets.side_bet_evs(tracker.composition())))
         
         user_input = input("\nAction (Cards / 'rec' / 'reset' / 'quit'): ").strip()
         
         if user_input.lower() == 'quit':
+            if metrics_path:
+                metrics.write_snapshot(metrics_path)
+                print(f"Metrics written to {metrics_path}")
             print("Goodbye!")
             break
+        elif user_input.lower() == 'chart':
+            print("\n" + charts.to_text(get_strategy_table(rules)))
+            continue
+        elif user_input.lower() == 'stats' and metrics_path:
+            print(metrics.to_json())
+            continue
         elif user_input.lower() == 'reset':
-            running_count = 0
-            cards_seen_total = 0
+            tracker.reset()
+            if log:
+                log.shoe(num_decks, rules)
             print("\n[!] Shoe reset. Counts cleared.")
             continue
         elif user_input.lower() == 'rec':
             # Recommendation Mode
             print("\n--- GET RECOMMENDATION ---")
             p_hand_str = input("  Your Hand (e.g. 'A 6' or 'A 6 2'): ")
-            p_hand = parse_cards(p_hand_str)
+            p_hand = parse_card_codes(p_hand_str)
             if len(p_hand) < 2:
                 print("  [!] Invalid hand. Need at least 2 cards.")
                 continue
                 
             d_card_str = input("  Dealer Upcard (e.g. '10'): ")
-            d_card = parse_cards(d_card_str)
+            d_card = parse_card_codes(d_card_str)
             if len(d_card) != 1:
                 print("  [!] Invalid upcard.")
                 continue
                 
-            basic_action = get_basic_strategy(p_hand, d_card[0], rules)
-            final_action, reason = apply_deviations(basic_action, p_hand, d_card[0], true_count, rules)
+            basic_action = lookup_basic_strategy(p_hand, d_card[0], rules)
+            final_action, reason = apply_deviations(basic_action, p_hand, d_card[0], true_count, rules, plays)
             
+            if log:
+                log.advice(p_hand, d_card[0], basic_action, final_action, true_count)
             print(f"\n  >>> RECOMMENDATION: {final_action}")
             print(f"  >>> Reason: {reason}")
+            cd_action, evs = tracker.advise(p_hand, d_card[0], rules)
+            print(f"  >>> {describe_advice(cd_action, evs, final_action)}")
+            if d_card[0] == ACE:
+                side = sidebets.side_bet_evs(tracker.composition(), list(p_hand), d_card[0])
+                hilo = "take" if true_count >= 3 else "skip"
+                print(f"  >>> Insurance: Hi-Lo says {hilo} (TC >= 3); exact EV {side['insurance'] * 100:+.1f}%")
+                if 'even_money_decline' in side:
+                    print(f"  >>> {sidebets.describe({'even_money_decline': side['even_money_decline']})}")
             input("\n  Press Enter to continue...")
             continue
             
         # Card Input Mode
-        cards = parse_cards(user_input)
+        cards = parse_card_codes(user_input)
         if not cards:
             continue
             
-        for card in cards:
-            val = get_hilo_value(card)
-            running_count += val
-            cards_seen_total += 1
+        tracker.add_many(cards)
+        if log:
+            log.cards(cards)
             
         print(f"  -> Processed {len(cards)} cards.")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Interactive blackjack advisor.")
+    parser.add_argument("--log", help="Binary session log to append to (and resume from)")
+    parser.add_argument("--metrics", help="Collect hot-path metrics and write them here on exit (.json or .prom)")
+    parser.add_argument("--index-set", help="Index plays to apply: a set name from deviations.py or a saved JSON file")
+    args = parser.parse_args()
+    plays = None
+    if args.index_set:
+        import deviations
+        try:
+            plays = deviations.resolve_index_set(args.index_set)
+        except ValueError as e:
+            parser.error(str(e))
+    main(args.log, args.metrics, plays)
@@ -1,35 +1,84 @@
+import os
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 import blackjack_advisor as ba
+import bet_ramp
+import charts
+import composition
+import sidebets
+import session_log
+
+# Keyboard entry: one key per rank ('0'/'T' for ten, '1'/'A' for ace).
+KEY_CARDS = {str(v): v for v in range(2, 10)}
+KEY_CARDS.update({'0': 10, 't': 10, 'j': 10, 'q': 10, 'k': 10, '1': ba.ACE, 'a': ba.ACE})
+ROUND_KEYS = ("Return", "KP_Enter", "space")
+# Undo steps kept by the tracker; older entries fall off the ring buffer.
+HISTORY_SIZE = 256
 
 class GradientFrame(tk.Canvas):
+    """
+    Vertical gradient background. The gradient is rendered once per window
+    size into an image (kept in a small cache) and redraws are debounced, so
+    a resize drag costs one image swap instead of a canvas line per pixel row.
+    """
+    RESIZE_DELAY_MS = 60
+    MAX_CACHED = 4
+
     def __init__(self, parent, color1, color2, **kwargs):
         super().__init__(parent, **kwargs)
         self.color1 = color1
         self.color2 = color2
-        self.bind("<Configure>", self._draw_gradient)
+        self._images = {}
+        self._image_item = None
+        self._redraw_id = None
+        self.bind("<Configure>", self._schedule_redraw)
+
+    def _schedule_redraw(self, event=None):
+        if self._redraw_id is not None:
+            self.after_cancel(self._redraw_id)
+        self._redraw_id = self.after(self.RESIZE_DELAY_MS, self._draw_gradient)
+
+    def _render(self, width, height):
+        (r1,g1,b1) = self.winfo_rgb(self.color1)
+        (r2,g2,b2) = self.winfo_rgb(self.color2)
+        r_ratio = float(r2-r1) / height
+        g_ratio = float(g2-g1) / height
+        b_ratio = float(b2-b1) / height
+
+        # One pixel wide column, one row per line, then stretched sideways.
+        rows = []
+        for i in range(height):
+            nr = int(r1 + (r_ratio * i)) >> 8
+            ng = int(g1 + (g_ratio * i)) >> 8
+            nb = int(b1 + (b_ratio * i)) >> 8
+            rows.append("{#%02x%02x%02x}" % (nr,ng,nb))
+        column = tk.PhotoImage(master=self, width=1, height=height)
+        column.put(" ".join(rows))
+        return column.zoom(width, 1)
 
     def _draw_gradient(self, event=None):
-        self.delete("gradient")
+        self._redraw_id = None
         width = self.winfo_width()
         height = self.winfo_height()
-        limit = height
-        (r1,g1,b1) = self.winfo_rgb(self.color1)
-        (r2,g2,b2) = self.winfo_rgb(self.color2)
-        r_ratio = float(r2-r1) / limit
-        g_ratio = float(g2-g1) / limit
-        b_ratio = float(b2-b1) / limit
-
-        for i in range(limit):
-            nr = int(r1 + (r_ratio * i))
-            ng = int(g1 + (g_ratio * i))
-            nb = int(b1 + (b_ratio * i))
-            color = "#%4.4x%4.4x%4.4x" % (nr,ng,nb)
-            self.create_line(0, i, width, i, tags=("gradient",), fill=color)
+        if width < 2 or height < 2:
+            return
+        image = self._images.pop((width, height), None)
+        if image is None:
+            image = self._render(width, height)
+            if len(self._images) >= self.MAX_CACHED:
+                del self._images[next(iter(self._images))]
+        # Re-insert so the dict stays in least-recently-used order.
+        self._images[(width, height)] = image
+
+        if self._image_item is None:
+            self._image_item = self.create_image(0, 0, anchor="nw", image=image, tags=("gradient",))
+        else:
+            self.itemconfig(self._image_item, image=image)
         self.tag_lower("gradient")
 
 class BlackjackAdvisorGUI:
-    def __init__(self, root):
+    def __init__(self, root, log_path=None):
         self.root = root
         self.root.title("Blackjack Advisor")
         self.root.geometry("650x550")
@@ -38,13 +87,38 @@ class BlackjackAdvisorGUI:
         self.gradient_bg = GradientFrame(root, "#053d1e", "#1e824c", highlightthickness=0)
         self.gradient_bg.place(x=0, y=0, relwidth=1, relheight=1)
         
-        self.running_count = 0
-        self.cards_seen_total = 0
         self.num_decks = 8
+        self.tracker = composition.ShoeTracker(self.num_decks, max_history=HISTORY_SIZE)
         self.rules = {'s17': True, 'das': False, 'surrender': False}
+        # The fixed ramp is used until the optimized one for the current
+        # configuration has been simulated (in the background on a cache miss).
+        self.bet_ramp = bet_ramp.DEFAULT_RAMP
+        self._ramp_config = None
+        self._ramp_building = False
+        self._ramp_failed = False
+        # Cards clicked since the last idle flush, and the pending status refresh.
+        self._pending_cards = []
+        self._status_id = None
+        # Cards typed in keyboard mode since the last round delimiter.
+        self._round_cards = bytearray()
         
         self.create_widgets()
-        self.reset_session()
+        self.root.bind("<Key>", self.on_key)
+
+        # Optional binary session log; an existing log resumes its last shoe.
+        self.log = None
+        resumed = None
+        if log_path:
+            if os.path.exists(log_path):
+                resumed, rules = session_log.replay(log_path, max_history=HISTORY_SIZE,
+                                                       tracker_class=composition.ShoeTracker)
+            self.log = session_log.SessionLog(log_path)
+        if resumed is not None:
+            self.decks_var.set(resumed.num_decks)
+            self.h17_var.set(not rules['s17'])
+            self.das_var.set(rules['das'])
+            self.surrender_var.set(rules['surrender'])
+        self.reset_session(resumed)
 
     def create_widgets(self):
         # Main container with padding to show gradient
@@ -69,6 +143,14 @@ class BlackjackAdvisorGUI:
         self.surrender_var = tk.BooleanVar(value=False)
         ttk.Checkbutton(config_frame, text="Surrender", variable=self.surrender_var).pack(side="left", padx=5)
         
+        ttk.Label(config_frame, text="Pen:").pack(side="left", padx=5)
+        self.pen_var = tk.DoubleVar(value=0.75)
+        ttk.Entry(config_frame, textvariable=self.pen_var, width=5).pack(side="left", padx=5)
+        
+        ttk.Label(config_frame, text="Bankroll:").pack(side="left", padx=5)
+        self.bankroll_var = tk.IntVar(value=1000)
+        ttk.Entry(config_frame, textvariable=self.bankroll_var, width=6).pack(side="left", padx=5)
+        
         ttk.Button(config_frame, text="Reset / Apply", command=self.reset_session).pack(side="right", padx=10)
 
         # --- Status Frame ---
@@ -95,7 +177,11 @@ class BlackjackAdvisorGUI:
 
         # Betting Advice Label
         self.bet_label = ttk.Label(status_frame, text="Bet: 1 Unit", font=("Arial", 12, "bold"), foreground="#d9534f")
-        self.bet_label.grid(row=1, column=0, columnspan=4, pady=(0, 10))
+        self.bet_label.grid(row=1, column=0, columnspan=4, pady=(0, 5))
+
+        # Side-bet EVs from the exact remaining shoe
+        self.side_label = ttk.Label(status_frame, text="", font=("Arial", 9))
+        self.side_label.grid(row=2, column=0, columnspan=4, pady=(0, 10))
 
         # --- Main Content Area ---
         content_frame = ttk.Frame(main_container)
@@ -114,6 +200,15 @@ class BlackjackAdvisorGUI:
         # Undo button
         ttk.Button(card_frame, text="Undo Last", command=self.undo_last_card).grid(row=4, column=0, columnspan=4, pady=10, sticky="ew", padx=5)
 
+        # Keyboard entry: ranks are typed, the round is counted on Enter/Space.
+        self.keyboard_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(card_frame, text="Keyboard entry (2-9, T/0, J Q K, A/1)", variable=self.keyboard_var,
+                        command=self.toggle_keyboard).grid(row=5, column=0, columnspan=4, sticky="w", padx=5)
+        self.round_label = ttk.Label(card_frame, text="", font=("Consolas", 11))
+        self.round_label.grid(row=6, column=0, columnspan=4, sticky="w", padx=5, pady=(2, 0))
+        ttk.Label(card_frame, text="Enter/Space: count round   Backspace: undo   Esc: clear",
+                  font=("Arial", 8)).grid(row=7, column=0, columnspan=4, sticky="w", padx=5)
+
         # --- Recommendation ---
         rec_frame = ttk.LabelFrame(content_frame, text="Get Recommendation")
         rec_frame.pack(side="right", fill="both", expand=True, padx=(5, 0))
@@ -126,14 +221,13 @@ class BlackjackAdvisorGUI:
         self.d_card_entry = ttk.Entry(rec_frame)
         self.d_card_entry.pack(pady=2, padx=10, fill="x")
         
-        ttk.Button(rec_frame, text="Get Advice", command=self.get_advice).pack(pady=15)
+        ttk.Button(rec_frame, text="Get Advice", command=self.get_advice).pack(pady=(15, 5))
+        ttk.Button(rec_frame, text="Show Chart", command=self.show_chart).pack(pady=(0, 10))
         
         self.result_label = ttk.Label(rec_frame, text="", font=("Arial", 11, "bold"), wraplength=250, justify="center")
         self.result_label.pack(pady=5, padx=5)
-        
-        self.history = [] # To store history for undo
 
-    def reset_session(self):
+    def reset_session(self, tracker=None):
         try:
             self.num_decks = self.decks_var.get()
         except:
@@ -144,62 +238,193 @@ class BlackjackAdvisorGUI:
         self.rules['das'] = self.das_var.get()
         self.rules['surrender'] = self.surrender_var.get()
         
-        self.running_count = 0
-        self.cards_seen_total = 0
-        self.history = []
+        if tracker is None:
+            tracker = composition.ShoeTracker(self.num_decks, max_history=HISTORY_SIZE)
+            if self.log:
+                self.log.shoe(self.num_decks, self.rules)
+        self.tracker = tracker
+        self._pending_cards = []
+        self.clear_round()
+        self.load_bet_ramp()
         self.update_status()
         self.result_label.config(text="")
 
-    def add_card(self, card_str):
-        val = ba.get_hilo_value(card_str)
-        self.running_count += val
-        self.cards_seen_total += 1
-        self.history.append(val)
+    def load_bet_ramp(self):
+        try:
+            penetration = min(max(self.pen_var.get(), 0.3), 0.95)
+        except:
+            penetration = 0.75
+        try:
+            bankroll = max(self.bankroll_var.get(), 1)
+        except:
+            bankroll = 1000
+
+        config = (dict(self.rules), self.num_decks, penetration, bankroll)
+        self._ramp_config = config
+        self._ramp_failed = False
+        ramp = bet_ramp.get_ramp(config[0], config[1], penetration, bankroll, compute=False)
+        if ramp is not None:
+            self.bet_ramp = ramp
+            self._ramp_building = False
+            return
+
+        self.bet_ramp = bet_ramp.DEFAULT_RAMP
+        self._ramp_building = True
+
+        # One mailbox per build, so a superseded build can never hand its
+        # ramp to a newer poller.
+        mailbox = []
+
+        def build():
+            # Always post something, so the poller stops even when the
+            # simulation raises.
+            ramp = error = None
+            try:
+                ramp = bet_ramp.get_ramp(config[0], config[1], penetration, bankroll)
+            except Exception as e:
+                error = e
+            finally:
+                mailbox.append((ramp, error))
+
+        threading.Thread(target=build, daemon=True).start()
+        self.root.after(200, self._check_bet_ramp, config, mailbox)
+
+    def _check_bet_ramp(self, config, mailbox):
+        # Tk is not thread-safe, so the worker only hands the ramp over and
+        # the main loop picks it up here.
+        if config is not self._ramp_config:
+            return  # superseded; the newer build has its own poller
+        if not mailbox:
+            self.root.after(200, self._check_bet_ramp, config, mailbox)
+            return
+        ramp, error = mailbox[0]
+        self._ramp_building = False
+        if ramp is None:
+            # Keep the fixed ramp and say so next to the bet.
+            self._ramp_failed = True
+            self.result_label.config(text=f"Bet ramp optimization failed: {error}", foreground="red")
+        else:
+            self.bet_ramp = ramp
         self.update_status()
+
+    def add_card(self, card_str):
+        # Queue the card; a burst of clicks is counted and shown in one
+        # idle-time refresh.
+        self._pending_cards.append(card_str)
+        self._schedule_status()
         
     def undo_last_card(self):
-        if not self.history:
+        self._flush_cards()
+        if not self.tracker.undo():
+            return
+        if self.log:
+            self.log.undo()
+        self.update_status()
+
+    def on_key(self, event):
+        if not self.keyboard_var.get() or isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return
+        if event.keysym in ROUND_KEYS:
+            self.commit_round()
+        elif event.keysym == "BackSpace":
+            if self._round_cards:
+                self._round_cards.pop()
+                self._show_round()
+            else:
+                self.undo_last_card()
+        elif event.keysym == "Escape":
+            self.clear_round()
+        else:
+            code = KEY_CARDS.get(event.char.lower())
+            if code is not None:
+                self._round_cards.append(code)
+                self._show_round()
+        return "break"
+
+    def toggle_keyboard(self):
+        # Take focus off any entry box or button so keys reach on_key only.
+        self.root.focus_set()
+        self.clear_round()
+
+    def commit_round(self):
+        """
+        Counts the typed round as one entry (so one Undo removes it) and
+        refreshes the status once.
+        """
+        if not self._round_cards:
             return
-        val = self.history.pop()
-        self.running_count -= val
-        self.cards_seen_total -= 1
+        self._flush_cards()
+        cards = bytes(self._round_cards)
+        self.tracker.add_many(cards)
+        if self.log:
+            self.log.cards(cards)
+        self.clear_round()
         self.update_status()
 
+    def clear_round(self):
+        self._round_cards.clear()
+        self._show_round()
+
+    def _show_round(self):
+        if self._round_cards:
+            text = "Round: " + " ".join(ba.decode_cards(self._round_cards))
+        elif self.keyboard_var.get():
+            text = "Round: (type cards)"
+        else:
+            text = ""
+        self.round_label.config(text=text)
+
+    def _flush_cards(self):
+        if self._pending_cards:
+            cards = self._pending_cards
+            self._pending_cards = []
+            # One history entry per card keeps Undo stepping card by card.
+            for card in cards:
+                self.tracker.add(card)
+                if self.log:
+                    self.log.card(ba.get_card_value(card))
+
+    def _schedule_status(self):
+        if self._status_id is None:
+            self._status_id = self.root.after_idle(self._refresh_status)
+
     def update_status(self):
-        decks_remaining = self.num_decks - (self.cards_seen_total / 52.0)
-        if decks_remaining < 0.5: decks_remaining = 0.5
-        
-        true_count = self.running_count / decks_remaining
+        """
+        Counts any queued cards and schedules one label refresh for when Tk
+        is idle. Returns the current true count.
+        """
+        self._flush_cards()
+        self._schedule_status()
+        return self.tracker.true_count
+
+    def _refresh_status(self):
+        self._status_id = None
+        self._flush_cards()
+        decks_remaining = self.tracker.decks_remaining
+        true_count = self.tracker.true_count
         
-        self.rc_label.config(text=f"RC: {self.running_count}")
+        self.rc_label.config(text=f"RC: {self.tracker.running_count}")
         self.tc_label.config(text=f"TC: {true_count:.1f}")
-        self.seen_label.config(text=f"Cards: {self.cards_seen_total}")
+        self.seen_label.config(text=f"Cards: {self.tracker.cards_seen}")
         self.decks_left_label.config(text=f"Decks Left: {decks_remaining:.2f}")
         
-        # Betting Strategy (Standard Hi-Lo Ramp)
-        # TC <= 1: 1 Unit (Min Bet)
-        # TC increases -> Bet increases
-        if true_count < 1.5:
-            units = 1
-        elif true_count < 2.5:
-            units = 2
-        elif true_count < 3.5:
-            units = 3
-        elif true_count < 4.5:
-            units = 4
+        # Betting Strategy (Kelly ramp for this table, see bet_ramp.py)
+        units = self.bet_ramp.units_for(true_count)
+        if self._ramp_building:
+            note = " (optimizing ramp...)"
+        elif self._ramp_failed:
+            note = " (default ramp)"
         else:
-            units = 5
-            
-        self.bet_label.config(text=f"RECOMMENDED BET: {units} UNIT(S)")
-        
-        return true_count
+            note = ""
+        self.bet_label.config(text=f"RECOMMENDED BET: {units} UNIT(S){note}")
+        self.side_label.config(text=sidebets.describe(sidebets.side_bet_evs(self.tracker.composition())))
 
     def get_advice(self):
         p_text = self.p_hand_entry.get()
         d_text = self.d_card_entry.get()
         
-        p_hand = ba.parse_cards(p_text)
-        d_card = ba.parse_cards(d_text)
+        p_hand = ba.parse_card_codes(p_text)
+        d_card = ba.parse_card_codes(d_text)
         
         if len(p_hand) < 2:
             self.result_label.config(text="Error: Player needs at least 2 cards", foreground="red")
@@ -210,13 +435,24 @@ class BlackjackAdvisorGUI:
             
         true_count = self.update_status() # Get current TC
         
-        basic_action = ba.get_basic_strategy(p_hand, d_card[0], self.rules)
+        basic_action = ba.lookup_basic_strategy(p_hand, d_card[0], self.rules)
         final_action, reason = ba.apply_deviations(basic_action, p_hand, d_card[0], true_count, self.rules)
+        if self.log:
+            self.log.advice(p_hand, d_card[0], basic_action, final_action, true_count)
+        # Composition-dependent EV estimates (solver.py) for the remaining shoe
+        cd_action, evs = self.tracker.advise(p_hand, d_card[0], self.rules)
+        cd_text = composition.describe_advice(cd_action, evs, final_action)
         
-        # Insurance Check (Hi-Lo Index >= 3)
-        if d_card[0] == 'A' and true_count >= 3:
+        # Insurance Check (Hi-Lo Index >= 3), with the exact EV alongside
+        if d_card[0] == ba.ACE and true_count >= 3:
             final_action += "\n[TAKE INSURANCE]"
             reason += " Insurance is profitable (TC >= 3)."
+        if d_card[0] == ba.ACE:
+            side = sidebets.side_bet_evs(self.tracker.composition(), list(p_hand), d_card[0])
+            cd_text += f"\nInsurance exact EV: {side['insurance'] * 100:+.1f}%"
+            if 'even_money_decline' in side:
+                cd_text += "\n" + sidebets.describe({'even_money_decline': side['even_money_decline']})
+        reason += "\n\n" + cd_text
 
         color = "green"
         if "STAND" in final_action: color = "red"
@@ -225,7 +461,25 @@ class BlackjackAdvisorGUI:
         
         self.result_label.config(text=f"{final_action}\n\n{reason}", foreground=color)
 
+    def show_chart(self):
+        window = tk.Toplevel(self.root)
+        window.title(f"Strategy Chart - {charts.describe_rules(self.rules)}")
+        text = tk.Text(window, font=("Consolas", 11), width=40, height=40)
+        text.insert("1.0", charts.to_text(ba.get_strategy_table(self.rules)))
+        text.config(state="disabled")
+        text.pack(fill="both", expand=True, padx=5, pady=5)
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Blackjack advisor GUI.")
+    parser.add_argument("--log", help="Binary session log to append to (and resume from)")
+    parser.add_argument("--metrics", help="Collect hot-path metrics; F12 or closing the window writes them here (.json or .prom)")
+    args = parser.parse_args()
+    charts.use_disk_cache()
+    if args.metrics:
+        import metrics
+        metrics.enable()
+
     root = tk.Tk()
     # Set theme if available
     try:
@@ -233,5 +487,11 @@ if __name__ == "__main__":
         style.theme_use('clam')
     except:
         pass
-    app = BlackjackAdvisorGUI(root)
+    app = BlackjackAdvisorGUI(root, args.log)
+    if args.metrics:
+        root.bind("<F12>", lambda e: metrics.write_snapshot(args.metrics))
+        def on_close():
+            metrics.write_snapshot(args.metrics)
+            root.destroy()
+        root.protocol("WM_DELETE_WINDOW", on_close)
     root.mainloop()
@@ -0,0 +1,275 @@
+"""
+Strategy charts: generation, on-disk cache and CSV/HTML/text export.
+
+A chart is a compiled strategy table (blackjack_advisor.table_index layout)
+from one of two sources:
+
+    chart   - the built-in get_basic_strategy chart (deck-independent)
+    solver  - solver.solve_strategy_table for a deck count
+
+Charts are stored one per file as one byte per cell, under a name hashed
+from the source, rules, deck count, STRATEGY_VERSION and a fingerprint of
+the code that produced them, so editing the strategy invalidates old files.
+use_disk_cache() makes blackjack_advisor load its tables from this cache
+and only compile (then save) on a miss.
+
+Usage:
+    python charts.py build                         # every rule set and deck count
+    python charts.py export --format html -o chart.html --decks 6 --h17
+"""
+import argparse
+import csv
+import hashlib
+import html
+import inspect
+import json
+import os
+import sys
+import blackjack_advisor as ba
+
+STRATEGY_VERSION = 1
+
+CACHE_DIR = os.path.join(os.environ.get("BLACKJACK_CACHE_DIR",
+                                        os.path.join(os.path.expanduser("~"), ".cache", "blackjack-advisor")),
+                         "charts")
+
+SOURCES = ('chart', 'solver')
+DECK_COUNTS = (1, 2, 4, 6, 8)
+ALL_RULES = [{'s17': s17, 'das': das, 'surrender': surrender}
+             for s17 in (True, False) for das in (True, False) for surrender in (True, False)]
+
+ACTIONS = ("HIT", "STAND", "DOUBLE", "SPLIT", "SURRENDER")
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+NO_CELL = 255
+TABLE_SIZE = ba.table_index(ba.HAND_PAIR + 1, 0, 0, 0)
+
+# Chart abbreviations (two-card decisions).
+SHORT = {"HIT": "H", "STAND": "S", "DOUBLE": "D", "SPLIT": "P", "SURRENDER": "R"}
+UPCARDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+
+_fingerprints = {}
+
+def _fingerprint(source):
+    # Hash of the code that decides the chart, computed once per process.
+    # The whole of blackjack_advisor is hashed, not just get_basic_strategy:
+    # compile_strategy_table, hand_key and table_index shape the table too.
+    fp = _fingerprints.get(source)
+    if fp is None:
+        digest = hashlib.sha256(inspect.getsource(ba).encode())
+        if source == 'solver':
+            import solver
+            digest.update(inspect.getsource(solver).encode())
+        fp = _fingerprints[source] = digest.hexdigest()[:16]
+    return fp
+
+def chart_key(rules, source='chart', num_decks=None):
+    """
+    Returns the cache key (hex digest) for a chart.
+    """
+    if source == 'chart':
+        num_decks = None
+    s17, das, surrender = ba.rules_key(rules)
+    ident = json.dumps({
+        'source': source, 's17': s17, 'das': das, 'surrender': surrender,
+        'decks': num_decks, 'version': STRATEGY_VERSION, 'code': _fingerprint(source),
+    }, sort_keys=True)
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key + ".chart")
+
+def encode_table(table):
+    return bytes(NO_CELL if a is None else ACTION_CODES[a] for a in table)
+
+def decode_table(data):
+    if len(data) != TABLE_SIZE:
+        raise ValueError(f"chart has {len(data)} cells, expected {TABLE_SIZE}")
+    return [None if c == NO_CELL else ACTIONS[c] for c in data]
+
+def build_table(rules, source='chart', num_decks=6):
+    if source == 'solver':
+        import solver
+        return solver.solve_strategy_table(rules, num_decks)
+    return ba.compile_strategy_table(rules)
+
+def load_chart(rules, source='chart', num_decks=6):
+    """
+    Returns a chart from the disk cache, or None if it has not been built.
+    """
+    try:
+        with open(_path(chart_key(rules, source, num_decks)), "rb") as f:
+            return decode_table(f.read())
+    except (OSError, ValueError):
+        return None
+
+def save_chart(table, rules, source='chart', num_decks=6):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _path(chart_key(rules, source, num_decks))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_table(table))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is an optimisation only
+
+def get_chart(rules, source='chart', num_decks=6):
+    """
+    Returns a chart, loading it from the cache or building and saving it.
+    """
+    table = load_chart(rules, source, num_decks)
+    if table is None:
+        table = build_table(rules, source, num_decks)
+        save_chart(table, rules, source, num_decks)
+    return table
+
+def build_all(sources=SOURCES, deck_counts=DECK_COUNTS, force=False):
+    """
+    Builds every chart that is not cached yet. Returns how many were built.
+    """
+    built = 0
+    for source in sources:
+        for num_decks in (deck_counts if source == 'solver' else (None,)):
+            for rules in ALL_RULES:
+                if not force and load_chart(rules, source, num_decks) is not None:
+                    continue
+                save_chart(build_table(rules, source, num_decks), rules, source, num_decks)
+                built += 1
+    return built
+
+def use_disk_cache(module=ba):
+    """
+    Makes module.get_strategy_table load built-in charts from the disk cache,
+    compiling and saving only on a miss. Pass module when blackjack_advisor
+    is running as __main__.
+    """
+    compile_table = module.compile_strategy_table
+    if getattr(compile_table, '_disk_cached', False):
+        return
+
+    def compile_strategy_table(rules):
+        table = load_chart(rules)
+        if table is None:
+            table = compile_table(rules)
+            save_chart(table, rules)
+        return table
+    compile_strategy_table.__wrapped__ = compile_table
+    compile_strategy_table._disk_cached = True
+    module.compile_strategy_table = compile_strategy_table
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def chart_rows(table):
+    """
+    Returns [(section, row label, [action per upcard 2..A])] for the two-card
+    chart: hard 5-20, soft 13-20 and pairs 2,2-A,A. Hard 20 only exists
+    as a pair in two cards, so its row shows the 3+ card decision.
+    """
+    rows = []
+    for total in range(5, 21):
+        rows.append(("Hard", str(total),
+                     [table[ba.table_index(ba.HAND_HARD, total, d, 1)]
+                      or table[ba.table_index(ba.HAND_HARD, total, d, 0)] for d in UPCARDS]))
+    for total in range(13, 21):
+        rows.append(("Soft", f"A,{total - 11}",
+                     [table[ba.table_index(ba.HAND_SOFT, total, d, 1)] for d in UPCARDS]))
+    for v in UPCARDS:
+        card = 'A' if v == 11 else str(v)
+        rows.append(("Pairs", f"{card},{card}",
+                     [table[ba.table_index(ba.HAND_PAIR, v, d, 1)] for d in UPCARDS]))
+    return rows
+
+def _up_labels():
+    return ['A' if d == 11 else str(d) for d in UPCARDS]
+
+def _short(action):
+    return SHORT.get(action, "-")
+
+def to_text(table):
+    lines = []
+    section = None
+    for sec, label, actions in chart_rows(table):
+        if sec != section:
+            section = sec
+            lines.append(f"{sec:<6} " + " ".join(f"{u:>2}" for u in _up_labels()))
+        lines.append(f"{label:<6} " + " ".join(f"{_short(a):>2}" for a in actions))
+    return "\n".join(lines)
+
+def to_csv(table, out):
+    writer = csv.writer(out)
+    writer.writerow(["section", "hand"] + _up_labels())
+    for sec, label, actions in chart_rows(table):
+        writer.writerow([sec, label] + [_short(a) for a in actions])
+
+_HTML_COLOURS = {"H": "#f7f7f7", "S": "#f2c94c", "D": "#6fcf97", "P": "#56ccf2", "R": "#eb5757", "-": "#ffffff"}
+
+def to_html(table, title="Basic strategy"):
+    parts = [
+        "<!DOCTYPE html>",
+        f"<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>",
+        "<style>table{border-collapse:collapse;font-family:sans-serif}"
+        "td,th{border:1px solid #999;padding:2px 8px;text-align:center}</style></head><body>",
+        f"<h2>{html.escape(title)}</h2>",
+        "<p>H hit, S stand, D double, P split, R surrender</p>",
+    ]
+    section = None
+    for sec, label, actions in chart_rows(table):
+        if sec != section:
+            if section is not None:
+                parts.append("</table>")
+            section = sec
+            parts.append(f"<h3>{sec}</h3><table><tr><th></th>"
+                         + "".join(f"<th>{u}</th>" for u in _up_labels()) + "</tr>")
+        cells = "".join(f'<td style="background:{_HTML_COLOURS[_short(a)]}">{_short(a)}</td>' for a in actions)
+        parts.append(f"<tr><th>{html.escape(label)}</th>{cells}</tr>")
+    parts.append("</table></body></html>")
+    return "\n".join(parts)
+
+def describe_rules(rules, source='chart', num_decks=None):
+    s17, das, surrender = ba.rules_key(rules)
+    text = f"{'S17' if s17 else 'H17'}, {'DAS' if das else 'no DAS'}, {'LS' if surrender else 'no surrender'}"
+    if source == 'solver':
+        text = f"{num_decks} decks, {text} (solver)"
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, cache and export strategy charts.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build every chart into the disk cache")
+    build.add_argument("--force", action="store_true", help="Rebuild charts that are already cached")
+
+    export = sub.add_parser("export", help="Export one chart")
+    export.add_argument("--source", choices=SOURCES, default="chart")
+    export.add_argument("-d", "--decks", type=int, default=6)
+    export.add_argument("--format", choices=["text", "csv", "html"], default="text")
+    export.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    export.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    export.add_argument("--no-das", action="store_true", help="No double after split")
+    export.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        built = build_all(force=args.force)
+        print(f"Built {built} charts in {CACHE_DIR}")
+        return
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    table = get_chart(rules, args.source, args.decks)
+    title = f"Basic strategy - {describe_rules(rules, args.source, args.decks)}"
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        if args.format == "csv":
+            to_csv(table, out)
+        elif args.format == "html":
+            out.write(to_html(table, title))
+        else:
+            out.write(title + "\n" + to_text(table) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
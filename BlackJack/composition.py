@@ -0,0 +1,117 @@
+"""
+Exact remaining-shoe tracking and composition-dependent advice.
+
+ShoeTracker is a CountTracker that also keeps the exact number of cards of
+each value left in the shoe, so its decks_remaining and the EVs below come
+from the real composition rather than the count alone. It is a drop-in
+replacement wherever a CountTracker is used.
+
+action_evs() runs the solver's hit/stand/double/split/surrender EVs against
+the remaining composition. They are estimates, not exact EVs: the solver
+does not deplete the shoe along later draws and never resplits (see
+solver.py), so advice picks the best action by those estimates. Results are memoized per (composition, hand,
+upcard, rules) with LRU eviction, and the dealer-outcome distributions under
+them are memoized per composition by solver.dealer_distribution, so
+repeated queries within a round are cache hits.
+"""
+from collections import deque
+from functools import lru_cache
+import blackjack_advisor as ba
+import solver
+
+_RULE_NAMES = ('s17', 'das', 'surrender')
+
+class ShoeTracker(ba.CountTracker):
+    """
+    CountTracker with exact per-value counts of the cards left in the shoe.
+    counts is indexed by card value (2-10, Ace=11) like solver compositions.
+    """
+    __slots__ = ('counts', '_drawn')
+
+    def reset(self):
+        super().reset()
+        self.counts = list(solver.shoe_composition(self.num_decks))
+        # Card codes per history entry, kept in step with history for undo.
+        self._drawn = deque(maxlen=self.max_history)
+
+    def add(self, card):
+        code = ba._CARD_VALUES[card]
+        tag = super().add(card)
+        self.counts[code] -= 1
+        self._drawn.append(bytes((code,)))
+        return tag
+
+    def add_many(self, cards):
+        codes = cards if isinstance(cards, (bytes, bytearray)) else ba.encode_cards(cards)
+        delta = super().add_many(codes)
+        if codes:
+            counts = self.counts
+            for v in set(codes):
+                counts[v] -= codes.count(v)
+            self._drawn.append(bytes(codes))
+        return delta
+
+    def undo(self):
+        if not super().undo():
+            return False
+        counts = self.counts
+        for v in self._drawn.pop():
+            counts[v] += 1
+        return True
+
+    @property
+    def cards_remaining(self):
+        return sum(max(c, 0) for c in self.counts)
+
+    @property
+    def decks_remaining(self):
+        if self._decks_remaining is None:
+            self._decks_remaining = max(0.5, self.cards_remaining / 52.0)
+        return self._decks_remaining
+
+    def composition(self, exclude=()):
+        """
+        Returns the remaining composition as a tuple, with the card values in
+        exclude (cards on the table not yet entered as seen) taken out.
+        """
+        counts = [max(c, 0) for c in self.counts]
+        for v in exclude:
+            if counts[v] > 0:
+                counts[v] -= 1
+        return tuple(counts)
+
+    def action_evs(self, player_hand, dealer_upcard, rules, counted=False):
+        """
+        Composition-dependent {action: estimated EV} for a hand. With counted=False the
+        player's cards and the upcard are removed from the shoe first; pass
+        counted=True if they have already been added as seen.
+        """
+        player = tuple(ba._CARD_VALUES[c] for c in player_hand)
+        up = ba._CARD_VALUES[dealer_upcard]
+        counts = self.composition() if counted else self.composition(player + (up,))
+        return dict(_action_evs(counts, player, up, ba.rules_key(rules)))
+
+    def advise(self, player_hand, dealer_upcard, rules, counted=False):
+        """
+        Returns (best action, {action: estimated EV}) for the remaining composition.
+        """
+        evs = self.action_evs(player_hand, dealer_upcard, rules, counted)
+        return solver.best_action(evs), evs
+
+@lru_cache(maxsize=4096)
+def _action_evs(counts, player, upcard, key):
+    rules = dict(zip(_RULE_NAMES, key))
+    return tuple(solver.composition_action_evs(list(player), upcard, counts, rules).items())
+
+def cache_info():
+    return _action_evs.cache_info()
+
+def describe_advice(action, evs, basic_action=None):
+    """
+    One-line summary like 'CD: STAND (est. STAND -0.541, HIT -0.555, ...)'.
+    """
+    ranked = sorted(evs.items(), key=lambda item: -item[1])
+    text = f"CD: {action} (est. " + ", ".join(f"{a} {ev:+.3f}" for a, ev in ranked) + ")"
+    if basic_action is not None and basic_action in evs and basic_action != action:
+        text += f" [+{evs[action] - evs[basic_action]:.3f} over {basic_action}]"
+    return text
@@ -0,0 +1,372 @@
+"""
+Count-system comparison lab.
+
+Compares tag sets (Hi-Lo, KO, Hi-Opt II, Omega II, Zen or any custom
+tags) on the same shuffled shoes:
+
+    betting correlation    - correlation of the tags with the effects of
+                             removal on the player's advantage
+    insurance correlation  - correlation of the tags with the insurance
+                             payoff (tens -9, everything else +4)
+    playing efficiency     - Griffin's measure: for every first decision
+                             (two-card hand against an upcard) and every
+                             alternative to the solver's best action, the
+                             gain the count captures relative to a perfect
+                             linear estimate, weighted by how often the
+                             decision comes up (see playing_efficiency).
+                             Hi-Lo comes out at 0.49 without surrender
+                             (published: 0.51)
+    index-play correlation - unweighted mean correlation of the tags with
+                             the effects of removal of the Illustrious 18
+                             and Fab 4 plays alone (not PE; Hi-Lo ~0.76)
+    win rate               - each system plays the first --sim-shoes of the
+                             same shoes through simulator.simulate, betting
+                             the ramp and playing the Hi-Lo indexes by its
+                             own true count
+
+The correlations are also measured empirically: the true count is set
+against the advantage and insurance EV at each round start of every shoe.
+Shoes are int8 arrays from shoes.py (generated per run or read from a
+shared pool); tags, running counts and the advantage estimates are
+cumulative sums over whole batches of shoes, so millions of shoes run in
+one pass. Each system's true count is put on the Hi-Lo scale (divided by
+the ratio of the tag standard deviations, after removing the drift of an
+unbalanced count) so one bet ramp serves every system.
+
+Usage:
+    python count_lab.py --shoes 1000000
+    python count_lab.py --system mine=1,1,1,1,1,0,0,0,-1,-1 --decks 2
+"""
+import argparse
+import itertools
+import json
+import math
+from functools import lru_cache
+import numpy as np
+import blackjack_advisor as ba
+import bet_ramp
+import deviations
+import shoes as shoe_pool
+import simulator
+import solver
+
+# Effects of removal on the player's advantage, in percent per card removed
+# from one deck (Griffin, The Theory of Blackjack). Indexed by card value.
+BETTING_EORS = (0, 0, 0.38, 0.44, 0.55, 0.69, 0.46, 0.28, 0.00, -0.18, -0.51, -0.61)
+# Insurance payoff per card removed: a ten removed hurts the bet.
+INSURANCE_EORS = (0, 0, 4, 4, 4, 4, 4, 4, 4, 4, -9, 4)
+
+VALUES = solver.CARD_VALUES
+# Ranks per value in a deck: four ten-valued ranks, one of everything else.
+RANK_WEIGHTS = (0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 4, 1)
+
+CHUNK_SHOES = 10000
+
+def parse_system(spec):
+    """
+    Parses 'name=t2,t3,...,t10,tA' into (name, tags indexed by card value).
+    """
+    name, _, tags = spec.partition("=")
+    values = [int(t) for t in tags.split(",")] if tags else []
+    if not name or len(values) != 10:
+        raise ValueError(f"system {spec!r} must look like name=t2,t3,t4,t5,t6,t7,t8,t9,t10,tA")
+    return name, ba._tags_by_value(values)
+
+def _weighted_stats(tags):
+    w = sum(RANK_WEIGHTS[v] for v in VALUES)
+    mean = sum(RANK_WEIGHTS[v] * tags[v] for v in VALUES) / w
+    var = sum(RANK_WEIGHTS[v] * (tags[v] - mean) ** 2 for v in VALUES) / w
+    return mean, math.sqrt(var)
+
+def correlation(tags, eors):
+    """
+    Rank-weighted correlation of a tag vector with an effect-of-removal vector.
+    """
+    mx, sx = _weighted_stats(tags)
+    my, sy = _weighted_stats(eors)
+    if not sx or not sy:
+        return 0.0
+    w = sum(RANK_WEIGHTS[v] for v in VALUES)
+    cov = sum(RANK_WEIGHTS[v] * (tags[v] - mx) * (eors[v] - my) for v in VALUES) / w
+    return cov / (sx * sy)
+
+@lru_cache(maxsize=16)
+def play_eors(rules_key, plays=deviations.ILLUSTRIOUS_18_FAB_4):
+    """
+    Returns [(play, EOR vector)] for the index plays that apply under the
+    rules. The EOR of a card is the change in EV(play) - EV(basic action)
+    when one card of that value is removed from a one-deck composition.
+    """
+    rules = dict(zip(('s17', 'das', 'surrender'), rules_key))
+    full = solver.shoe_composition(1)
+    result = []
+    for play in plays:
+        if not ba.play_applies_to_rules(play, rules):
+            continue
+        hand = deviations.sample_hand(play)
+        base_action = deviations._base_action(play, rules)
+        counts = solver.remove_cards(full, hand + [play.upcard])
+        if min(counts) < 0:
+            continue
+
+        def gain(c):
+            evs = solver.composition_action_evs(hand, play.upcard, c, rules)
+            return evs[play.action] - evs[base_action]
+
+        try:
+            base = gain(counts)
+        except KeyError:
+            continue  # the play's action is not allowed under these rules
+        eors = [0.0] * 12
+        for v in VALUES:
+            if counts[v] > 0:
+                eors[v] = gain(solver.remove_cards(counts, (v,))) - base
+        result.append((play, tuple(eors)))
+    return result
+
+def index_play_correlation(tags, rules, plays=deviations.ILLUSTRIOUS_18_FAB_4):
+    """
+    Mean correlation of the tags with each index play's EOR vector
+    (unweighted, so not comparable with published playing efficiency). Plays
+    made below their index gain as the count falls, so their sign is flipped.
+    """
+    corrs = [correlation(tags, eors) * (-1 if play.direction == 'below' else 1)
+             for play, eors in play_eors(ba.rules_key(rules), plays)]
+    return sum(corrs) / len(corrs) if corrs else 0.0
+
+def _normal_gain(m, sd):
+    # E[max(0, X)] for X ~ N(m, sd^2): what deviating whenever X > 0 gains.
+    if sd <= 0:
+        return max(m, 0.0)
+    z = m / sd
+    return sd * math.exp(-z * z / 2) / math.sqrt(2 * math.pi) + m * 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+@lru_cache(maxsize=16)
+def decision_eors(rules_key):
+    """
+    Returns [(frequency, mean gain, gain variance per card, cards left, EOR
+    vector)] for every first decision - each two-card hand (naturals
+    excluded) against each upcard, dealt from one deck - and every action
+    other than the solver's best one there. The gain is EV(action) -
+    EV(best) on the composition left after the hand and upcard; the EOR
+    of a card is how that gain changes when one card of its value is
+    removed.
+    """
+    rules = dict(zip(('s17', 'das', 'surrender'), rules_key))
+    full = solver.shoe_composition(1)
+    result = []
+    for up in VALUES:
+        for v1, v2 in solver._two_card_hands():
+            if v1 + v2 == 21:
+                continue
+            counts = solver.remove_cards(full, (v1, v2, up))
+            if min(counts) < 0:
+                continue
+            frequency = (full[up] / 52 * full[v1] / 51 * (full[v2] - (v1 == v2)) / 50
+                         * (1 if v1 == v2 else 2))
+            evs = solver.composition_action_evs([v1, v2], up, counts, rules)
+            best = solver.best_action(evs)
+            removed = {v: solver.composition_action_evs([v1, v2], up, solver.remove_cards(counts, (v,)), rules)
+                       for v in VALUES if counts[v] > 0}
+            n = sum(counts)
+            for action in evs:
+                if action == best:
+                    continue
+                gain = evs[action] - evs[best]
+                eors = [0.0] * 12
+                for v, r in removed.items():
+                    eors[v] = r[action] - r[best] - gain
+                mean = sum(counts[v] * eors[v] for v in VALUES) / n
+                var = sum(counts[v] * (eors[v] - mean) ** 2 for v in VALUES) / n
+                result.append((frequency, gain, var, n, tuple(eors)))
+    return result
+
+def playing_efficiency(tags, rules, penetration=0.75):
+    """
+    Griffin's playing efficiency of a tag set. Removing k of the n cards
+    left moves a decision's gain by a roughly normal amount with standard
+    deviation sd_k = sqrt(var * k * (n - k) / (n - 1)); a perfect linear
+    estimate captures E[max(0, gain)] of it and a count correlated rho
+    with the EORs captures the same with sd_k scaled by |rho|. PE is the
+    frequency-weighted sum of the count's captured gain over the perfect
+    one, averaged over depths up to penetration of one deck.
+    """
+    num = den = 0.0
+    for frequency, gain, var, n, eors in decision_eors(ba.rules_key(rules)):
+        rho = abs(correlation(tags, eors))
+        for k in range(1, int(n * penetration) + 1):
+            sd = math.sqrt(var * k * (n - k) / (n - 1))
+            num += frequency * _normal_gain(gain, rho * sd)
+            den += frequency * _normal_gain(gain, sd)
+    return num / den if den else 0.0
+
+# ---------------------------------------------------------------------------
+# Shoe sweep
+# ---------------------------------------------------------------------------
+
+def _cumulative(shoes, lut, dtype):
+    # Sum of lut[card] over the first k cards of each shoe, for k = 0..len.
+    out = np.zeros((shoes.shape[0], shoes.shape[1] + 1), dtype=dtype)
+    np.cumsum(lut[shoes], axis=1, dtype=dtype, out=out[:, 1:])
+    return out
+
+class _Correlation:
+    """
+    Streaming Pearson correlation from running sums.
+    """
+    __slots__ = ('n', 'sx', 'sy', 'sxx', 'syy', 'sxy')
+
+    def __init__(self):
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, x, y):
+        self.n += x.size
+        self.sx += float(x.sum())
+        self.sy += float(y.sum())
+        self.sxx += float((x * x).sum())
+        self.syy += float((y * y).sum())
+        self.sxy += float((x * y).sum())
+
+    @property
+    def value(self):
+        if self.n < 2:
+            return 0.0
+        cov = self.sxy - self.sx * self.sy / self.n
+        vx = self.sxx - self.sx * self.sx / self.n
+        vy = self.syy - self.sy * self.sy / self.n
+        return cov / math.sqrt(vx * vy) if vx > 0 and vy > 0 else 0.0
+
+def _shoe_batches(pool, shoes, num_decks, seed):
+    # The same batches on every call: pool rows, or seeded generated shoes.
+    rng = np.random.default_rng(seed)
+    for done in range(0, shoes, CHUNK_SHOES):
+        n = min(CHUNK_SHOES, shoes - done)
+        yield pool[done:done + n] if pool is not None else shoe_pool.generate_shoes(n, num_decks, rng)
+
+def _shoe_rows(batches, limit):
+    # The first limit shoes of the batches as lists, as simulator.simulate deals them.
+    return itertools.islice((row for batch in batches for row in batch.tolist()), limit)
+
+def compare_systems(systems, rules, num_decks=6, penetration=0.75, shoes=100000,
+                    cards_per_round=5, ramp=bet_ramp.DEFAULT_RAMP, base_ev=None, seed=1, pool=None,
+                    sim_shoes=10000):
+    """
+    Runs every system over the same shoes. systems maps a name to tags
+    indexed by card value. base_ev is the flat-bet EV per round off the top
+    used by the empirical correlations; when None it is measured with the
+    simulator. The win rate is simulated over the first sim_shoes shoes.
+    pool (see shoes.load_pool) supplies the shoes instead of generating
+    them; num_decks is taken from it and shoes is capped at its size.
+    Returns {name: metrics}.
+    """
+    if pool is not None:
+        num_decks = shoe_pool.pool_decks(pool)
+        shoes = min(shoes, len(pool))
+    if base_ev is None:
+        base_ev = simulator.simulate(200000, rules, num_decks, penetration, seed=seed,
+                                     use_deviations=False, insurance_index=None).ev
+    n_cards = 52 * num_decks
+    # Round starts: cards seen before each round, up to the cut card.
+    seen = np.arange(0, int(n_cards * penetration) + 1, cards_per_round)
+    remaining = n_cards - seen
+    decks_remaining = np.maximum(remaining / 52.0, 0.5)
+
+    eor_lut = np.array(BETTING_EORS, dtype=np.float32) / 100.0
+    ten_lut = (np.arange(12) == 10).astype(np.int16)
+    hilo_sd = _weighted_stats(ba.COUNT_SYSTEMS['hilo'])[1]
+
+    per_system = {}
+    for name, tags in systems.items():
+        drift, sd = _weighted_stats(tags)
+        per_system[name] = {
+            'lut': np.array(tags, dtype=np.int8),
+            'drift': drift,
+            'scale': hilo_sd / sd if sd else 1.0,
+            'bet': _Correlation(), 'insurance': _Correlation(),
+        }
+
+    for batch in _shoe_batches(pool, shoes, num_decks, seed):
+        advantage = base_ev + _cumulative(batch, eor_lut, np.float32)[:, seen] * (52.0 / remaining)
+        tens_left = 16 * num_decks - _cumulative(batch, ten_lut, np.int16)[:, seen]
+        insurance = 3.0 * tens_left / remaining - 1.0
+        for s in per_system.values():
+            rc = _cumulative(batch, s['lut'], np.int16)[:, seen]
+            tc = (rc - s['drift'] * seen) / decks_remaining * s['scale']
+            s['bet'].add(tc, advantage)
+            s['insurance'].add(tc, insurance)
+
+    results = {}
+    for name, s in per_system.items():
+        tags = systems[name]
+        # Tags shifted and scaled so the simulator's plain true count is
+        # this system's count on the Hi-Lo scale.
+        scaled = tuple((t - s['drift']) * s['scale'] for t in tags)
+        rows = _shoe_rows(_shoe_batches(pool, shoes, num_decks, seed), min(sim_shoes, shoes))
+        stats = simulator.simulate(None, rules, num_decks, penetration, seed=seed,
+                                   bet_ramp=ramp.units_for, shoes=rows, tags=scaled)
+        results[name] = {
+            'betting_correlation': correlation(tags, BETTING_EORS),
+            'insurance_correlation': correlation(tags, INSURANCE_EORS),
+            'playing_efficiency': playing_efficiency(tags, rules, penetration),
+            'index_play_correlation': index_play_correlation(tags, rules),
+            'empirical_betting_correlation': s['bet'].value,
+            'empirical_insurance_correlation': s['insurance'].value,
+            'rounds': stats.rounds,
+            'ev_per_round': stats.ev,
+            'ev_per_bet': stats.ev_per_bet,
+            'std': stats.std,
+            'average_bet': stats.total_bet / stats.rounds if stats.rounds else 0.0,
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare count systems on identical shoes.")
+    parser.add_argument("-n", "--shoes", type=int, default=100000)
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("-p", "--penetration", type=float, default=0.75)
+    parser.add_argument("--cards-per-round", type=int, default=5, help="Cards dealt per round (sets the round starts)")
+    parser.add_argument("--base-ev", type=float, default=None,
+                        help="Flat-bet EV per round off the top (default: simulate it)")
+    parser.add_argument("--system", action="append", default=[],
+                        help="Extra tag set as name=t2,t3,...,t10,tA")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    parser.add_argument("--sim-shoes", type=int, default=10000, help="Shoes played through the simulator for the win rate")
+    parser.add_argument("--pool", help="Use the shoes in a pool built by shoes.py")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    systems = dict(ba.COUNT_SYSTEMS)
+    for spec in args.system:
+        name, tags = parse_system(spec)
+        systems[name] = tags
+
+    pool = None
+    if args.pool:
+        pool = shoe_pool.load_pool(args.pool)
+        args.decks = shoe_pool.pool_decks(pool)
+        args.shoes = min(args.shoes, len(pool))
+    results = compare_systems(systems, rules, args.decks, args.penetration, args.shoes,
+                              args.cards_per_round, base_ev=args.base_ev, seed=args.seed, pool=pool,
+                              sim_shoes=args.sim_shoes)
+    rounds = next(iter(results.values()))['rounds']
+    print(f"{args.shoes} shoes ({rounds} rounds simulated), {args.decks} decks, "
+          f"penetration {args.penetration:.0%}")
+    print(f" {'System':<10} {'BC':>6} {'PE':>6} {'IPC':>6} {'IC':>6} {'BC emp':>7} {'IC emp':>7} "
+          f"{'EV/round':>9} {'EV/bet':>8} {'Avg bet':>8}")
+    for name, r in sorted(results.items(), key=lambda item: -item[1]['ev_per_round']):
+        print(f" {name:<10} {r['betting_correlation']:6.3f} {r['playing_efficiency']:6.3f} "
+              f"{r['index_play_correlation']:6.3f} "
+              f"{r['insurance_correlation']:6.3f} {r['empirical_betting_correlation']:7.3f} "
+              f"{r['empirical_insurance_correlation']:7.3f} {r['ev_per_round'] * 100:+8.3f}% "
+              f"{r['ev_per_bet'] * 100:+7.3f}% {r['average_bet']:8.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Index sets for count deviations.
+
+blackjack_advisor.apply_deviations reads its plays from a compiled
+IndexPlay table; this module provides fuller index sets (Illustrious 18,
+Fab 4), JSON load/save for custom sets, and a generator that derives index
+numbers for a rule set and count system from EV measured across true-count
+buckets.
+
+Derivation deals random depths into shuffled shoes, buckets each depleted
+shoe by its true count and, for every play, compares the solver's EV of
+the play against the basic action on the remaining composition. The
+index is where the EV difference changes sign.
+
+The advisor CLI and the simulator take --index-set with a set name or a
+saved file to play by it.
+
+Usage:
+    python deviations.py --decks 6 --system hilo -o indexes.json
+    python simulator.py --index-set indexes.json
+"""
+import argparse
+import json
+import random
+import blackjack_advisor as ba
+import solver
+from blackjack_advisor import IndexPlay, HAND_HARD, HAND_SOFT, HAND_PAIR
+
+_SURRENDER = (('surrender', True),)
+
+# Hi-Lo, multi-deck S17. Insurance (take at TC >= 3) is not a playing
+# decision, so it is left to the insurance check.
+ILLUSTRIOUS_18 = (
+    IndexPlay(HAND_HARD, 16, 10, 0, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 15, 10, 4, "STAND", "HIT"),
+    IndexPlay(HAND_PAIR, 10, 5, 5, "SPLIT", "STAND"),
+    IndexPlay(HAND_PAIR, 10, 6, 4, "SPLIT", "STAND"),
+    IndexPlay(HAND_HARD, 10, 10, 4, "DOUBLE", "HIT", initial_only=True),
+    IndexPlay(HAND_HARD, 12, 3, 2, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 12, 2, 3, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 11, 11, 1, "DOUBLE", "HIT", initial_only=True),
+    IndexPlay(HAND_HARD, 9, 2, 1, "DOUBLE", "HIT", initial_only=True),
+    IndexPlay(HAND_HARD, 10, 11, 4, "DOUBLE", "HIT", initial_only=True),
+    IndexPlay(HAND_HARD, 9, 7, 3, "DOUBLE", "HIT", initial_only=True),
+    IndexPlay(HAND_HARD, 16, 9, 5, "STAND", "HIT"),
+    IndexPlay(HAND_HARD, 13, 2, -1, "HIT", "STAND", 'below'),
+    IndexPlay(HAND_HARD, 12, 4, 0, "HIT", "STAND", 'below'),
+    IndexPlay(HAND_HARD, 12, 5, -2, "HIT", "STAND", 'below'),
+    IndexPlay(HAND_HARD, 12, 6, -1, "HIT", "STAND", 'below'),
+    IndexPlay(HAND_HARD, 13, 3, -2, "HIT", "STAND", 'below'),
+)
+
+# Late surrender plays; only active when the rules allow surrender.
+FAB_4 = (
+    IndexPlay(HAND_HARD, 14, 10, 3, "SURRENDER", "HIT", rules=_SURRENDER, initial_only=True),
+    IndexPlay(HAND_HARD, 15, 10, 0, "HIT", "SURRENDER", 'below', rules=_SURRENDER, initial_only=True),
+    IndexPlay(HAND_HARD, 15, 9, 2, "SURRENDER", "HIT", rules=_SURRENDER, initial_only=True),
+    IndexPlay(HAND_HARD, 15, 11, 1, "SURRENDER", "HIT", rules=_SURRENDER, initial_only=True),
+)
+
+# Surrender plays go first so they win over standing on the same cell.
+ILLUSTRIOUS_18_FAB_4 = FAB_4 + ILLUSTRIOUS_18
+
+INDEX_SETS = {
+    'default': ba.DEVIATIONS,
+    'i18': ILLUSTRIOUS_18,
+    'fab4': FAB_4,
+    'i18_fab4': ILLUSTRIOUS_18_FAB_4,
+}
+
+_CLASS_NAMES = {HAND_HARD: 'hard', HAND_SOFT: 'soft', HAND_PAIR: 'pair'}
+_CLASS_CODES = {name: code for code, name in _CLASS_NAMES.items()}
+_ACTIONS = ("HIT", "STAND", "DOUBLE", "SPLIT", "SURRENDER")
+
+# ---------------------------------------------------------------------------
+# File format
+# ---------------------------------------------------------------------------
+
+def play_to_dict(play):
+    d = {
+        'hand': _CLASS_NAMES[play.hand_class],
+        'total': play.total,
+        'upcard': 'A' if play.upcard == 11 else str(play.upcard),
+        'index': play.index,
+        'action': play.action,
+    }
+    if play.only_from is not None:
+        d['only_from'] = play.only_from
+    if play.direction != 'above':
+        d['direction'] = play.direction
+    if play.rules:
+        d['rules'] = dict(play.rules)
+    if play.initial_only:
+        d['initial_only'] = True
+    return d
+
+def play_from_dict(d):
+    """
+    Builds an IndexPlay from its JSON form. Raises ValueError on bad fields.
+    """
+    try:
+        hand = d.get('hand', 'hard')
+        if hand not in _CLASS_CODES:
+            raise ValueError(f"index play {d!r} has bad hand {hand!r}")
+        hand_class = _CLASS_CODES[hand]
+        total = int(d['total'])
+        if hand_class == HAND_PAIR:
+            if not 2 <= total <= 11:
+                raise ValueError(f"index play {d!r} has bad pair total {total} (expected 2-11)")
+        elif not 4 <= total <= 21:
+            raise ValueError(f"index play {d!r} has bad total {total} (expected 4-21)")
+        upcard = ba.get_card_value(str(d['upcard']))
+        if upcard is None:
+            raise ValueError(f"index play {d!r} has bad upcard {d['upcard']!r}")
+        action = str(d['action']).upper()
+        if action not in _ACTIONS:
+            raise ValueError(f"index play {d!r} has bad action {action!r}")
+        only_from = d.get('only_from')
+        if only_from is not None and only_from not in _ACTIONS:
+            raise ValueError(f"index play {d!r} has bad only_from {only_from!r}")
+        direction = d.get('direction', 'above')
+        if direction not in ('above', 'below'):
+            raise ValueError(f"index play {d!r} has bad direction {direction!r}")
+        return IndexPlay(hand_class, total, upcard, float(d['index']), action,
+                         only_from, direction,
+                         tuple(sorted((k, bool(v)) for k, v in d.get('rules', {}).items())),
+                         bool(d.get('initial_only', False)))
+    except KeyError as e:
+        raise ValueError(f"index play {d!r} is missing {e}") from None
+
+def load_index_set(path):
+    """
+    Loads an index set saved by save_index_set (a JSON list of plays).
+    Returns a tuple of IndexPlay, in file order.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('plays', [])
+    return tuple(play_from_dict(d) for d in data)
+
+def resolve_index_set(spec):
+    """
+    Returns the plays for an --index-set argument: a built-in set name
+    (see INDEX_SETS) or the path of a JSON file saved by save_index_set.
+    Raises ValueError if the file cannot be read or holds a bad play.
+    """
+    if spec in INDEX_SETS:
+        return INDEX_SETS[spec]
+    try:
+        return load_index_set(spec)
+    except OSError as e:
+        raise ValueError(f"cannot read index set {spec!r}: {e.strerror}") from None
+
+def save_index_set(plays, path):
+    with open(path, "w") as f:
+        json.dump([play_to_dict(p) for p in plays], f, indent=2)
+
+# ---------------------------------------------------------------------------
+# Index derivation
+# ---------------------------------------------------------------------------
+
+def sample_hand(play):
+    """
+    Returns a representative two-card hand (card values) for an index play.
+    """
+    if play.hand_class == HAND_PAIR:
+        return [play.total, play.total]
+    if play.hand_class == HAND_SOFT:
+        return [11, play.total - 11]
+    if play.total >= 12:
+        return [10, play.total - 10]
+    low = (play.total - 1) // 2
+    return [play.total - low, low]
+
+def _base_action(play, rules):
+    if play.only_from is not None:
+        return play.only_from
+    table = ba.get_strategy_table(rules)
+    return table[ba.table_index(play.hand_class, play.total, play.upcard, 1)]
+
+def ev_by_true_count(plays, rules, num_decks=6, system='hilo', samples=2000,
+                     penetration=0.8, seed=None, tc_range=(-6, 8)):
+    """
+    Measures EV(play action) - EV(base action) per true-count bucket.
+    Returns {play: {bucket: (mean EV difference, samples)}}.
+    """
+    rng = random.Random(seed)
+    tags = ba.COUNT_SYSTEMS[system]
+    start_rc = ba.initial_running_count(system, num_decks)
+    full = solver.shoe_composition(num_decks)
+    shoe = [v for v in solver.CARD_VALUES for _ in range(full[v])]
+    lo, hi = tc_range
+    plays = [p for p in plays if ba.play_applies_to_rules(p, rules)]
+    sums = {p: {} for p in plays}
+
+    for _ in range(samples):
+        rng.shuffle(shoe)
+        depth = rng.randint(len(shoe) // 4, int(len(shoe) * penetration))
+        counts = list(full)
+        rc = start_rc
+        for v in shoe[:depth]:
+            counts[v] -= 1
+            rc += tags[v]
+        decks_remaining = max(0.5, (len(shoe) - depth) / 52.0)
+        bucket = min(max(round(rc / decks_remaining), lo), hi)
+
+        for play in plays:
+            cards = sample_hand(play) + [play.upcard]
+            if any(counts[v] < cards.count(v) for v in cards):
+                continue
+            remaining = solver.remove_cards(counts, cards)
+            evs = solver.composition_action_evs(cards[:2], play.upcard, remaining, rules)
+            base = _base_action(play, rules)
+            if play.action not in evs or base not in evs:
+                continue
+            total, n = sums[play].get(bucket, (0.0, 0))
+            sums[play][bucket] = (total + evs[play.action] - evs[base], n + 1)
+
+    return {p: {b: (t / n, n) for b, (t, n) in sorted(by_bucket.items())}
+            for p, by_bucket in sums.items()}
+
+def index_from_curve(curve, direction='above', min_samples=20):
+    """
+    Finds the index in a {bucket: (mean EV difference, samples)} curve.
+    For 'above' it is the lowest bucket from which the play always gains;
+    for 'below' it is one past the highest bucket up to which it always gains.
+    Returns None when the curve never crosses.
+    """
+    buckets = [b for b, (_, n) in sorted(curve.items()) if n >= min_samples]
+    gains = {b: curve[b][0] > 0 for b in buckets}
+    if direction == 'below':
+        index = None
+        for b in buckets:
+            if not gains[b]:
+                break
+            index = b + 1
+        return index
+    index = None
+    for b in reversed(buckets):
+        if not gains[b]:
+            break
+        index = b
+    return index
+
+def derive_indexes(plays, rules, num_decks=6, system='hilo', samples=2000,
+                   penetration=0.8, seed=None, min_samples=20):
+    """
+    Returns a new index set with each play's index derived for these rules
+    and this count system. Plays that never cross are dropped.
+    """
+    curves = ev_by_true_count(plays, rules, num_decks, system, samples, penetration, seed)
+    derived = []
+    for play in plays:
+        if play not in curves:
+            continue
+        index = index_from_curve(curves[play], play.direction, min_samples)
+        if index is not None:
+            derived.append(play._replace(index=index))
+    return tuple(derived)
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive index numbers for a rule set and count system.")
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("--system", default="hilo", choices=sorted(ba.COUNT_SYSTEMS))
+    parser.add_argument("--set", dest="index_set", default="i18_fab4", choices=sorted(INDEX_SETS),
+                        help="Plays to derive indexes for")
+    parser.add_argument("--samples", type=int, default=2000, help="Depleted shoes to sample")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    parser.add_argument("-o", "--output", help="Write the derived index set to this JSON file")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    template = INDEX_SETS[args.index_set]
+    derived = derive_indexes(template, rules, args.decks, args.system, args.samples, seed=args.seed)
+    by_cell = {(p.hand_class, p.total, p.upcard, p.action): p.index for p in derived}
+    for play in template:
+        d = play_to_dict(play)
+        cell = f"{d['hand']} {play.total} vs {d['upcard']} -> {play.action}"
+        new = by_cell.get((play.hand_class, play.total, play.upcard, play.action))
+        new_text = "no crossing" if new is None else f"{new:g}"
+        print(f" {cell:<28}: listed {play.index:>4g}   derived {new_text}")
+    if args.output:
+        save_index_set(derived, args.output)
+        print(f"Saved {len(derived)} plays to {args.output}")
+
+if __name__ == "__main__":
+    main()
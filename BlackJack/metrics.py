@@ -0,0 +1,281 @@
+"""
+Optional instrumentation for the advisor hot paths.
+
+enable() swaps timing wrappers in for the module-level functions in
+blackjack_advisor, and disable() puts the originals back. Callers look the
+functions up on the module, so nothing changes for them; with metrics off
+there is no wrapper at all and therefore no overhead.
+
+Collected per function: call count, total time and a latency histogram.
+Decision functions also count the actions they return, and deviations are
+counted per cell and action. snapshot() returns everything as a dict;
+to_json() and to_prometheus() render it, and serve() exposes it over HTTP
+for long-running processes.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import blackjack_advisor as ba
+
+# Histogram bucket upper bounds, in microseconds (the last bucket is +Inf).
+BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+INSTRUMENTED = ('parse_cards', 'parse_card_codes', 'calculate_hand',
+                'get_basic_strategy', 'lookup_basic_strategy', 'apply_deviations')
+_DECISIONS = ('get_basic_strategy', 'lookup_basic_strategy')
+
+_originals = {}
+_lock = threading.Lock()
+
+class _Quiet(threading.local):
+    # Per thread: > 0 while a table is being compiled on this thread.
+    depth = 0
+
+_quiet = _Quiet()
+
+class FunctionStats:
+    __slots__ = ('calls', 'total_ns', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.buckets = [0] * (len(BUCKETS_US) + 1)
+
+    def record(self, elapsed_ns):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.buckets[bisect_left(BUCKETS_US, elapsed_ns / 1000.0)] += 1
+
+    def quantile(self, q):
+        """
+        Upper bound (microseconds) of the bucket holding quantile q; None if
+        it falls in the overflow bucket or nothing was recorded.
+        """
+        if not self.calls:
+            return None
+        target = q * self.calls
+        seen = 0
+        for bound, n in zip(BUCKETS_US, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'total_seconds': self.total_ns / 1e9,
+            'mean_us': self.total_ns / self.calls / 1000.0 if self.calls else 0.0,
+            'p50_us': self.quantile(0.5),
+            'p99_us': self.quantile(0.99),
+            'buckets_us': dict(zip([str(b) for b in BUCKETS_US] + ['+Inf'], self.buckets)),
+        }
+
+functions = {}
+actions = {}      # {function name: {action: count}}
+deviations = {}   # {(cell label, basic, action): count}
+_started = time.time()
+
+def reset():
+    global _started
+    # Zero in place: installed wrappers hold on to these objects.
+    with _lock:
+        for stats in functions.values():
+            stats.__init__()
+        for counts in actions.values():
+            counts.clear()
+        deviations.clear()
+        _started = time.time()
+
+def _stats(name):
+    stats = functions.get(name)
+    if stats is None:
+        stats = functions[name] = FunctionStats()
+    return stats
+
+def _wrap(name, func):
+    stats = _stats(name)
+    clock = time.perf_counter_ns
+
+    if name in _DECISIONS:
+        counts = actions.setdefault(name, {})
+
+        def wrapper(*args, **kwargs):
+            if _quiet.depth:
+                return func(*args, **kwargs)
+            start = clock()
+            result = func(*args, **kwargs)
+            stats.record(clock() - start)
+            counts[result] = counts.get(result, 0) + 1
+            return result
+    elif name == 'apply_deviations':
+        counts = actions.setdefault(name, {})
+
+        def wrapper(basic_action, player_hand, dealer_upcard, *args, **kwargs):
+            if _quiet.depth:
+                return func(basic_action, player_hand, dealer_upcard, *args, **kwargs)
+            start = clock()
+            result = func(basic_action, player_hand, dealer_upcard, *args, **kwargs)
+            stats.record(clock() - start)
+            action = result[0]
+            counts[action] = counts.get(action, 0) + 1
+            if action != basic_action:
+                _count_deviation(basic_action, action, player_hand, dealer_upcard)
+            return result
+    else:
+        def wrapper(*args, **kwargs):
+            if _quiet.depth:
+                return func(*args, **kwargs)
+            start = clock()
+            result = func(*args, **kwargs)
+            stats.record(clock() - start)
+            return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    wrapper.__wrapped__ = func
+    return wrapper
+
+def _count_deviation(basic, action, player_hand, dealer_upcard):
+    hand_class, total, _ = ba.hand_key(player_hand)
+    label = ba._cell_label(hand_class, total, ba.get_card_value(dealer_upcard))
+    key = (label, basic, action)
+    deviations[key] = deviations.get(key, 0) + 1
+
+def _quiet_compile(func):
+    # Table compilation calls get_basic_strategy thousands of times; the
+    # wrappers pass straight through while this thread compiles, so it does
+    # not show up as advice given. Other threads are still measured.
+    def compile_strategy_table(rules):
+        _quiet.depth += 1
+        try:
+            return func(rules)
+        finally:
+            _quiet.depth -= 1
+    compile_strategy_table.__wrapped__ = func
+    return compile_strategy_table
+
+def enabled():
+    return bool(_originals)
+
+def enable(names=INSTRUMENTED, module=ba):
+    """
+    Installs the timing wrappers. Calling it again is harmless. Pass module
+    when blackjack_advisor is running as __main__.
+    """
+    with _lock:
+        for name in names:
+            if (module, name) in _originals:
+                continue
+            func = getattr(module, name)
+            _originals[module, name] = func
+            setattr(module, name, _wrap(name, func))
+        if (module, 'compile_strategy_table') not in _originals:
+            func = module.compile_strategy_table
+            _originals[module, 'compile_strategy_table'] = func
+            module.compile_strategy_table = _quiet_compile(func)
+
+def disable():
+    """
+    Restores the original functions; collected data is kept until reset().
+    """
+    with _lock:
+        for (module, name), func in _originals.items():
+            setattr(module, name, func)
+        _originals.clear()
+
+def snapshot():
+    with _lock:
+        return {
+            'enabled': enabled(),
+            'uptime_seconds': time.time() - _started,
+            'functions': {name: s.to_dict() for name, s in sorted(functions.items())},
+            'actions': {name: dict(sorted(c.items())) for name, c in sorted(actions.items())},
+            'deviations': [{'cell': cell, 'basic': basic, 'action': action, 'count': n}
+                           for (cell, basic, action), n in sorted(deviations.items())],
+        }
+
+def to_json(snap=None):
+    return json.dumps(snapshot() if snap is None else snap, indent=2)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def to_prometheus(snap=None):
+    """
+    Renders a snapshot in the Prometheus text exposition format.
+    """
+    snap = snapshot() if snap is None else snap
+    lines = [
+        "# HELP blackjack_advisor_calls_total Calls per instrumented function.",
+        "# TYPE blackjack_advisor_calls_total counter",
+    ]
+    for name, f in snap['functions'].items():
+        lines.append(f'blackjack_advisor_calls_total{{function="{name}"}} {f["calls"]}')
+
+    lines += [
+        "# HELP blackjack_advisor_latency_seconds Call latency per instrumented function.",
+        "# TYPE blackjack_advisor_latency_seconds histogram",
+    ]
+    for name, f in snap['functions'].items():
+        cumulative = 0
+        for bound, n in f['buckets_us'].items():
+            cumulative += n
+            le = bound if bound == '+Inf' else f"{int(bound) / 1e6:g}"
+            lines.append(f'blackjack_advisor_latency_seconds_bucket{{function="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'blackjack_advisor_latency_seconds_sum{{function="{name}"}} {f["total_seconds"]:.9f}')
+        lines.append(f'blackjack_advisor_latency_seconds_count{{function="{name}"}} {f["calls"]}')
+
+    lines += [
+        "# HELP blackjack_advisor_actions_total Actions returned per decision function.",
+        "# TYPE blackjack_advisor_actions_total counter",
+    ]
+    for name, counts in snap['actions'].items():
+        for action, n in counts.items():
+            lines.append(f'blackjack_advisor_actions_total{{function="{name}",action="{action}"}} {n}')
+
+    lines += [
+        "# HELP blackjack_advisor_deviations_total Count deviations that fired, per cell.",
+        "# TYPE blackjack_advisor_deviations_total counter",
+    ]
+    for d in snap['deviations']:
+        lines.append(f'blackjack_advisor_deviations_total{{cell="{_escape(d["cell"])}",'
+                     f'basic="{d["basic"]}",action="{d["action"]}"}} {d["count"]}')
+    return "\n".join(lines) + "\n"
+
+def write_snapshot(path):
+    """
+    Writes a snapshot to path: Prometheus text for .prom/.txt, else JSON.
+    """
+    text = to_prometheus() if path.endswith((".prom", ".txt")) else to_json()
+    with open(path, "w") as f:
+        f.write(text)
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, ctype = to_json().encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, ctype = to_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve(port, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus) and /metrics.json from a daemon thread.
+    Returns the server; call shutdown() on it to stop.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
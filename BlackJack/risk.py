@@ -0,0 +1,236 @@
+"""
+Bankroll and risk-of-ruin Monte Carlo.
+
+Plays many independent sessions, each starting from a fixed bankroll and
+betting a ramp for up to a set number of rounds, and reports the risk of
+ruin, N0 and the distribution of session results. Sessions are sharded over
+a process pool; each session is seeded from its global number, so the
+worker and shard counts only change scheduling, and each shard returns
+only streaming statistics, which are merged in the parent.
+
+Hands are played by simulator.simulate, i.e. the advisor's compiled basic
+strategy and index plays.
+
+Usage:
+    python risk.py --bankroll 1000 --session-rounds 10000 --trials 2000
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import bet_ramp
+import simulator
+
+class RiskStats:
+    """
+    Mergeable results for a set of sessions: ruin count, running moments
+    of the session result (Welford), a sparse histogram of results for
+    quantiles, and per-round SimulationStats.
+    """
+    __slots__ = ('sessions', 'ruined', 'mean', 'm2', 'bin_width', 'histogram',
+                 'ruin_rounds', 'rounds')
+
+    def __init__(self, bin_width=1.0):
+        self.sessions = 0
+        self.ruined = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.bin_width = bin_width
+        self.histogram = {}
+        self.ruin_rounds = 0
+        self.rounds = simulator.SimulationStats()
+
+    def add(self, result, ruined_at=None):
+        self.sessions += 1
+        delta = result - self.mean
+        self.mean += delta / self.sessions
+        self.m2 += delta * (result - self.mean)
+        b = math.floor(result / self.bin_width)
+        self.histogram[b] = self.histogram.get(b, 0) + 1
+        if ruined_at is not None:
+            self.ruined += 1
+            self.ruin_rounds += ruined_at
+
+    def merge(self, other):
+        # Chan et al. pairwise update for the running moments.
+        n = self.sessions + other.sessions
+        if n:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.sessions * other.sessions / n
+            self.mean += delta * other.sessions / n
+        self.sessions = n
+        self.ruined += other.ruined
+        self.ruin_rounds += other.ruin_rounds
+        for b, count in other.histogram.items():
+            self.histogram[b] = self.histogram.get(b, 0) + count
+        self.rounds.merge(other.rounds)
+        return self
+
+    @property
+    def risk_of_ruin(self):
+        return self.ruined / self.sessions if self.sessions else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.sessions - 1)) if self.sessions > 1 else 0.0
+
+    def quantile(self, q):
+        """
+        Session result at quantile q, to the resolution of the histogram.
+        """
+        if not self.sessions:
+            return 0.0
+        target = q * self.sessions
+        seen = 0
+        for b in sorted(self.histogram):
+            seen += self.histogram[b]
+            if seen >= target:
+                return (b + 0.5) * self.bin_width
+        return (max(self.histogram) + 0.5) * self.bin_width
+
+    @property
+    def n0(self):
+        """
+        Rounds needed for the expected win to equal one standard deviation.
+        """
+        ev = self.rounds.ev
+        return self.rounds.variance / (ev * ev) if ev > 0 else math.inf
+
+    def summary(self):
+        return {
+            'sessions': self.sessions,
+            'risk_of_ruin': self.risk_of_ruin,
+            'mean_result': self.mean,
+            'std_result': self.std,
+            'quantiles': {q: self.quantile(q) for q in (0.05, 0.25, 0.5, 0.75, 0.95)},
+            'mean_rounds_to_ruin': self.ruin_rounds / self.ruined if self.ruined else None,
+            'ev_per_round': self.rounds.ev,
+            'std_per_round': self.rounds.std,
+            'n0': self.n0,
+            'rounds': self.rounds.rounds,
+            'hands_per_sec': self.rounds.hands_per_sec,
+        }
+
+class _Ruined(Exception):
+    pass
+
+def run_sessions(sessions, bankroll, session_rounds, rules, ramp, num_decks=6,
+                 penetration=0.75, seed=None, bin_width=None, first_session=0):
+    """
+    Plays sessions one after another in this process. A session ends early
+    once the bankroll cannot cover the next minimum bet. Session i is seeded
+    from its global number first_session + i, so results do not depend on
+    how sessions are split into shards.
+    """
+    stats = RiskStats(bin_width or max(bankroll / 100.0, 1.0))
+    rounds = stats.rounds
+    min_bet = min(ramp.units)
+    state = [0.0, 0, 0.0, 0.0, 0.0]  # result, rounds, sum, sum of squares, total bet
+
+    def on_round(tc, bet, won):
+        state[0] += won
+        state[1] += 1
+        state[2] += won
+        state[3] += won * won
+        state[4] += bet
+        if bankroll + state[0] < min_bet:
+            raise _Ruined()
+
+    start = time.perf_counter()
+    for i in range(sessions):
+        state[0] = 0.0
+        state[1] = 0
+        ruined_at = None
+        # Seeds like "7/1234" hash into an independent stream per session.
+        session_seed = None if seed is None else f"{seed}/{first_session + i}"
+        try:
+            simulator.simulate(session_rounds, rules, num_decks=num_decks, penetration=penetration,
+                               seed=session_seed, bet_ramp=ramp.units_for, on_round=on_round)
+        except _Ruined:
+            ruined_at = state[1]
+        rounds.rounds += state[1]
+        stats.add(state[0], ruined_at)
+    rounds.total, rounds.total_sq, rounds.total_bet = state[2], state[3], state[4]
+    rounds.elapsed = time.perf_counter() - start
+    return stats
+
+def _run_shard(args):
+    sessions, bankroll, session_rounds, rules, ramp_dict, num_decks, penetration, seed, bin_width, first = args
+    return run_sessions(sessions, bankroll, session_rounds, rules, bet_ramp.BetRamp.from_dict(ramp_dict),
+                        num_decks, penetration, seed, bin_width, first)
+
+def risk_of_ruin(trials, bankroll, session_rounds, rules, ramp=None, num_decks=6,
+                 penetration=0.75, seed=None, workers=None, shards=None):
+    """
+    Runs trials sessions across a process pool and returns the merged
+    RiskStats. ramp defaults to the optimized ramp for this bankroll.
+    """
+    if ramp is None:
+        ramp = bet_ramp.get_ramp(rules, num_decks, penetration, bankroll)
+    workers = workers or os.cpu_count() or 1
+    shards = min(trials, shards or workers * 4)
+    bin_width = max(bankroll / 100.0, 1.0)
+    base_seed = seed if seed is not None else time.time_ns()
+
+    jobs = []
+    first = 0
+    for shard in range(shards):
+        n = trials // shards + (1 if shard < trials % shards else 0)
+        jobs.append((n, bankroll, session_rounds, rules, ramp.to_dict(), num_decks,
+                     penetration, base_seed, bin_width, first))
+        first += n
+
+    start = time.perf_counter()
+    total = RiskStats(bin_width)
+    if workers == 1:
+        results = map(_run_shard, jobs)
+        for stats in results:
+            total.merge(stats)
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            for stats in pool.map(_run_shard, jobs):
+                total.merge(stats)
+    # Report throughput by wall clock, not summed worker time.
+    total.rounds.elapsed = time.perf_counter() - start
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Risk of ruin and session outcomes for a bankroll and bet ramp.")
+    parser.add_argument("-b", "--bankroll", type=float, default=1000, help="Bankroll in betting units")
+    parser.add_argument("-r", "--session-rounds", type=int, default=10000, help="Rounds per session")
+    parser.add_argument("-t", "--trials", type=int, default=1000, help="Sessions to simulate")
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("-p", "--penetration", type=float, default=0.75)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--flat", action="store_true", help="Flat 1-unit bets instead of the optimized ramp")
+    parser.add_argument("--default-ramp", action="store_true", help="Use the fixed 1-5 unit ramp")
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    ramp = None
+    if args.flat:
+        ramp = bet_ramp.BetRamp((), (1,))
+    elif args.default_ramp:
+        ramp = bet_ramp.DEFAULT_RAMP
+    stats = risk_of_ruin(args.trials, args.bankroll, args.session_rounds, rules, ramp,
+                         args.decks, args.penetration, args.seed, args.workers)
+    s = stats.summary()
+    print(f" {'Sessions':<20}: {s['sessions']}")
+    print(f" {'Risk of ruin':<20}: {s['risk_of_ruin'] * 100:.2f}%")
+    if s['mean_rounds_to_ruin'] is not None:
+        print(f" {'Rounds to ruin':<20}: {s['mean_rounds_to_ruin']:.0f} (mean, ruined sessions)")
+    print(f" {'Session result':<20}: {s['mean_result']:+.1f} units (SD {s['std_result']:.1f})")
+    for q, value in s['quantiles'].items():
+        print(f" {f'  {int(q * 100)}th percentile':<20}: {value:+.1f} units")
+    print(f" {'EV per round':<20}: {s['ev_per_round']:+.4f} units")
+    print(f" {'SD per round':<20}: {s['std_per_round']:.3f} units")
+    print(f" {'N0':<20}: {s['n0']:.0f} rounds")
+    print(f" {'Hands/sec':<20}: {s['hands_per_sec']:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Append-only binary session log.
+
+Every count event and recommendation is written as one fixed-width record,
+so a log can be memory-mapped and replayed without parsing text: a session
+resumes from its log, and weeks of shoes can be reprocessed for analysis.
+
+File layout: an 8-byte header (magic, version, record size) followed by
+24-byte little-endian records:
+
+    time     float64  seconds since the epoch
+    kind     uint8    SHOE, CARD, UNDO or ADVICE
+    a        uint8    SHOE: decks        CARD: card code    ADVICE: upcard
+    b        uint8    SHOE: rules bits   CARD: 1 if it continues a batch
+                                         ADVICE: action code
+    c        uint8                                          ADVICE: basic action code
+    tc       int16    ADVICE: true count x 100
+    cards    10 bytes ADVICE: player card codes, zero padded
+
+A batch (add_many) is one CARD record per card, the first with b=0, so
+replay rebuilds the tracker history entry for entry and undo matches the
+live session exactly. A torn record at the end of the file is ignored.
+
+Usage:
+    python session_log.py session.bjl            # summary
+    python session_log.py session.bjl --dump     # one line per record
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+import blackjack_advisor as ba
+
+MAGIC = b"BJLG"
+VERSION = 1
+HEADER = struct.Struct("<4sHH")
+RECORD = struct.Struct("<dBBBBh10s")
+
+SHOE, CARD, UNDO, ADVICE = 1, 2, 3, 4
+KIND_NAMES = {SHOE: 'shoe', CARD: 'card', UNDO: 'undo', ADVICE: 'advice'}
+
+ACTIONS = ("HIT", "STAND", "DOUBLE", "SPLIT", "SURRENDER")
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+
+_RULE_BITS = (('s17', 1), ('das', 2), ('surrender', 4))
+
+LogRecord = namedtuple('LogRecord', 'time kind a b c tc cards')
+
+def rules_to_bits(rules):
+    s17, das, surrender = ba.rules_key(rules)
+    return (1 if s17 else 0) | (2 if das else 0) | (4 if surrender else 0)
+
+def bits_to_rules(bits):
+    return {name: bool(bits & bit) for name, bit in _RULE_BITS}
+
+class SessionLog:
+    """
+    Appends records to a log file. Each event is flushed as it is written,
+    so a crash loses at most the record being written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) < HEADER.size
+        self._file = open(path, "ab")
+        if new:
+            self._file.truncate(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        else:
+            # Drop a torn record from an interrupted write so later records stay aligned.
+            tail = (os.path.getsize(path) - HEADER.size) % RECORD.size
+            if tail:
+                self._file.truncate(os.path.getsize(path) - tail)
+        self._file.flush()
+
+    def _write(self, kind, a=0, b=0, c=0, tc=0, cards=b""):
+        self._file.write(RECORD.pack(time.time(), kind, a, b, c, tc, bytes(cards[:10])))
+
+    def shoe(self, num_decks, rules):
+        self._write(SHOE, min(num_decks, 255), rules_to_bits(rules))
+        self._file.flush()
+
+    def card(self, code):
+        self._write(CARD, code)
+        self._file.flush()
+
+    def cards(self, codes):
+        """
+        Logs a batch counted with one add_many call.
+        """
+        for i, code in enumerate(codes):
+            self._write(CARD, code, 1 if i else 0)
+        self._file.flush()
+
+    def undo(self):
+        self._write(UNDO)
+        self._file.flush()
+
+    def advice(self, player, upcard, basic, action, true_count):
+        tc = max(-32768, min(32767, round(true_count * 100)))
+        self._write(ADVICE, upcard, ACTION_CODES[action], ACTION_CODES[basic], tc, player)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_records(path):
+    """
+    Yields every record in a log as a LogRecord, reading through mmap.
+    """
+    if os.path.getsize(path) <= HEADER.size:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, size = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or size != RECORD.size:
+            raise ValueError(f"{path} is not a version {VERSION} session log")
+        end = HEADER.size + (len(mm) - HEADER.size) // size * size
+        view = memoryview(mm)[HEADER.size:end]
+        try:
+            for fields in RECORD.iter_unpack(view):
+                yield LogRecord._make(fields)
+        finally:
+            view.release()
+
+def replay(path, max_history=None, tracker_class=ba.CountTracker):
+    """
+    Rebuilds the state of the last shoe in a log.
+    Returns (tracker, rules), or (None, None) if the log has no shoe.
+    tracker_class can be any CountTracker subclass (e.g. ShoeTracker).
+    """
+    tracker = rules = None
+    batch = bytearray()
+
+    def flush():
+        if batch:
+            tracker.add_many(bytes(batch))
+            batch.clear()
+
+    for rec in read_records(path):
+        kind = rec.kind
+        if kind == CARD:
+            if tracker is None:
+                continue
+            if not rec.b:
+                flush()
+            batch.append(rec.a)
+        elif kind == UNDO:
+            if tracker is not None:
+                flush()
+                tracker.undo()
+        elif kind == SHOE:
+            batch.clear()
+            tracker = tracker_class(rec.a, max_history=max_history)
+            rules = bits_to_rules(rec.b)
+    if tracker is not None:
+        flush()
+    return tracker, rules
+
+def summarize(path):
+    """
+    Returns counts of shoes, cards, undos and advice (with deviations) in a log.
+    """
+    summary = {'shoes': 0, 'cards': 0, 'undos': 0, 'advice': 0, 'deviations': 0}
+    for rec in read_records(path):
+        if rec.kind == CARD:
+            summary['cards'] += 1
+        elif rec.kind == ADVICE:
+            summary['advice'] += 1
+            if rec.b != rec.c:
+                summary['deviations'] += 1
+        elif rec.kind == SHOE:
+            summary['shoes'] += 1
+        elif rec.kind == UNDO:
+            summary['undos'] += 1
+    return summary
+
+def format_record(rec):
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(rec.time))
+    kind = KIND_NAMES.get(rec.kind, str(rec.kind))
+    if rec.kind == SHOE:
+        detail = f"{rec.a} decks {bits_to_rules(rec.b)}"
+    elif rec.kind == CARD:
+        detail = ba.decode_cards([rec.a])[0] + (" (batch)" if rec.b else "")
+    elif rec.kind == ADVICE:
+        player = " ".join(ba.decode_cards(rec.cards.rstrip(b"\0")))
+        detail = (f"{player} vs {ba.decode_cards([rec.a])[0]} TC {rec.tc / 100:.2f}: "
+                  f"{ACTIONS[rec.b]} (basic {ACTIONS[rec.c]})")
+    else:
+        detail = ""
+    return f"{stamp} {kind:<6} {detail}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize or dump a binary session log.")
+    parser.add_argument("log")
+    parser.add_argument("--dump", action="store_true", help="Print every record")
+    args = parser.parse_args()
+
+    if args.dump:
+        for rec in read_records(args.log):
+            print(format_record(rec))
+        return
+    for key, value in summarize(args.log).items():
+        print(f" {key.capitalize():<12}: {value}")
+    tracker, rules = replay(args.log)
+    if tracker is not None:
+        print(f" {'Last shoe':<12}: RC {tracker.running_count}, {tracker.cards_seen} cards seen, "
+              f"TC {tracker.true_count:.1f}, rules {rules}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Bulk shoe generation and shared shoe pools.
+
+Shoes are int8 arrays of card values (2-10, Ace=11, the same codes as
+blackjack_advisor.encode_cards), one row per shoe, shuffled a whole batch
+at a time with NumPy permutations instead of card by card.
+
+A pool is a seeded batch of shoes saved as a .npy file. Opening it with
+load_pool memory-maps it read-only, so any number of runs and worker
+processes share the same pages without copying, and every consumer sees
+the same shoes in the same order. Pass a pool to simulator.simulate
+(shoes=iter_shoes(pool)) to play two strategies on identical shoes for a
+variance-reduced comparison.
+
+Usage:
+    python shoes.py build pool.npy --shoes 100000 --decks 6 --seed 1
+    python shoes.py info pool.npy
+"""
+import argparse
+import numpy as np
+import blackjack_advisor as ba
+import simulator
+
+CHUNK_SHOES = 10000
+
+def generate_shoes(n_shoes, num_decks=6, rng=None):
+    """
+    Returns an (n_shoes, 52 * num_decks) int8 array of independently
+    shuffled shoes. rng is a numpy Generator or a seed.
+    """
+    if not isinstance(rng, np.random.Generator):
+        rng = np.random.default_rng(rng)
+    base = np.array(simulator.build_shoe(num_decks), dtype=np.int8)
+    return rng.permuted(np.broadcast_to(base, (n_shoes, base.size)), axis=1)
+
+def build_pool(path, n_shoes, num_decks=6, seed=1):
+    """
+    Writes a pool of n_shoes seeded shoes to path (.npy), in chunks so the
+    whole pool never has to fit in memory. The same seed always gives the
+    same pool.
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.lib.format.open_memmap(path, mode="w+", dtype=np.int8, shape=(n_shoes, 52 * num_decks))
+    for start in range(0, n_shoes, CHUNK_SHOES):
+        stop = min(start + CHUNK_SHOES, n_shoes)
+        pool[start:stop] = generate_shoes(stop - start, num_decks, rng)
+    pool.flush()
+    del pool
+
+def load_pool(path):
+    """
+    Memory-maps a pool read-only. Returns an (n_shoes, cards) int8 array.
+    """
+    pool = np.load(path, mmap_mode="r")
+    if pool.dtype != np.int8 or pool.ndim != 2 or pool.shape[1] % 52:
+        raise ValueError(f"{path} is not a shoe pool")
+    return pool
+
+def pool_decks(pool):
+    return pool.shape[1] // 52
+
+def iter_shoes(pool, start=0, stop=None, repeat=False):
+    """
+    Yields the shoes in pool[start:stop] as lists of card values, the form
+    simulator.simulate deals from. With repeat the range is cycled forever.
+    """
+    stop = len(pool) if stop is None else stop
+    while True:
+        for row in range(start, stop, CHUNK_SHOES):
+            # Convert a chunk at a time: one tolist() call per chunk instead of per shoe.
+            yield from pool[row:min(row + CHUNK_SHOES, stop)].tolist()
+        if not repeat:
+            return
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a shared shoe pool.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write a seeded pool of shuffled shoes")
+    build.add_argument("path")
+    build.add_argument("-n", "--shoes", type=int, default=100000)
+    build.add_argument("-d", "--decks", type=int, default=6)
+    build.add_argument("--seed", type=int, default=1)
+    info = sub.add_parser("info", help="Describe a pool")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_pool(args.path, args.shoes, args.decks, args.seed)
+    pool = load_pool(args.path)
+    print(f" {'Shoes':<12}: {len(pool)}")
+    print(f" {'Decks':<12}: {pool_decks(pool)}")
+    print(f" {'Size':<12}: {pool.nbytes / 1e6:.1f} MB")
+    print(f" {'First cards':<12}: {' '.join(ba.decode_cards(pool[0, -10:][::-1].tolist()))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Insurance and side-bet EVs from the remaining shoe composition.
+
+Works from a solver-style composition (card counts indexed by value). Ten-
+valued cards are split evenly over 10/J/Q/K and every rank evenly over the
+four suits, since only values are tracked. Each EV is a closed-form sum
+over the 13 ranks and the precomputed straight table, so a query costs a
+few dozen multiplications and can run after every card.
+
+EVs are per unit staked on that bet:
+    insurance        - pays 2:1 when the dealer's hole card is a ten
+    even money       - EV of declining even money on a blackjack vs an Ace
+                       (taking it is worth exactly +1)
+    Perfect Pairs    - first two player cards; mixed/coloured/perfect pair
+    21+3             - player's two cards plus the dealer upcard as a
+                       three-card poker hand
+"""
+
+# Paytables (to one). The common Perfect Pairs 25/12/6 and 21+3 100/40/30/10/5 tables.
+PERFECT_PAIRS_PAYS = {'perfect': 25, 'coloured': 12, 'mixed': 6}
+TWENTY_ONE_PLUS_3_PAYS = {'suited_trips': 100, 'straight_flush': 40, 'three_of_a_kind': 30,
+                          'straight': 10, 'flush': 5}
+
+# Ranks 0-12 are A, 2, ..., 10, J, Q, K. Card value of each rank:
+RANK_VALUES = (11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)
+
+# Every three-rank straight: A-2-3 up to J-Q-K, plus Q-K-A.
+STRAIGHTS = tuple((r, r + 1, r + 2) for r in range(11)) + ((11, 12, 0),)
+
+def rank_counts(counts):
+    """
+    Per-rank counts (A, 2..10, J, Q, K) from a composition indexed by value.
+    """
+    ten = max(counts[10], 0) / 4.0
+    return tuple(ten if v == 10 else max(counts[v], 0) for v in RANK_VALUES)
+
+def _remove(counts, values):
+    counts = list(counts)
+    for v in values:
+        if counts[v] > 0:
+            counts[v] -= 1
+    return counts
+
+def insurance_ev(counts):
+    """
+    EV of a unit insurance bet given the unseen cards (dealer's Ace and the
+    player's cards already removed).
+    """
+    n = sum(max(c, 0) for c in counts[2:12])
+    if n <= 0:
+        return 0.0
+    p_ten = max(counts[10], 0) / n
+    return 3.0 * p_ten - 1.0
+
+def even_money_decline_ev(counts):
+    """
+    EV of declining even money with a blackjack against an Ace: paid 3:2
+    unless the dealer also has blackjack. Taking even money is always +1.
+    """
+    n = sum(max(c, 0) for c in counts[2:12])
+    if n <= 0:
+        return 1.5
+    return 1.5 * (1.0 - max(counts[10], 0) / n)
+
+def perfect_pairs_ev(counts, pays=PERFECT_PAIRS_PAYS):
+    ranks = rank_counts(counts)
+    n = sum(ranks)
+    if n < 2:
+        return 0.0
+    perfect = coloured = mixed = 0.0
+    for c in ranks:
+        per_suit = c / 4.0
+        # First card of this rank, then the same suit / same colour / other colour.
+        perfect += c * max(per_suit - 1.0, 0.0)
+        coloured += c * per_suit
+        mixed += c * 2.0 * per_suit
+    pairs = n * (n - 1)
+    perfect /= pairs
+    coloured /= pairs
+    mixed /= pairs
+    win = pays['perfect'] * perfect + pays['coloured'] * coloured + pays['mixed'] * mixed
+    return win - (1.0 - perfect - coloured - mixed)
+
+def twenty_one_plus_three_probabilities(counts):
+    """
+    Returns {outcome: probability} for the 21+3 hand categories.
+    """
+    ranks = rank_counts(counts)
+    n = sum(ranks)
+    if n < 3:
+        return {k: 0.0 for k in TWENTY_ONE_PLUS_3_PAYS}
+    triples = n * (n - 1) * (n - 2)  # ordered draws
+
+    suited_trips = trips = 0.0
+    for c in ranks:
+        m = c / 4.0
+        same_suit = 4.0 * m * max(m - 1.0, 0.0) * max(m - 2.0, 0.0)
+        suited_trips += same_suit
+        trips += c * max(c - 1.0, 0.0) * max(c - 2.0, 0.0) - same_suit
+
+    straight_flush = straight = 0.0
+    for a, b, c in STRAIGHTS:
+        na, nb, nc = ranks[a], ranks[b], ranks[c]
+        suited = 4.0 * (na / 4.0) * (nb / 4.0) * (nc / 4.0)
+        straight_flush += 6.0 * suited
+        straight += 6.0 * (na * nb * nc - suited)
+
+    per_suit = n / 4.0
+    all_suited = 4.0 * per_suit * (per_suit - 1.0) * (per_suit - 2.0)
+    flush = all_suited - straight_flush - suited_trips
+
+    return {
+        'suited_trips': suited_trips / triples,
+        'straight_flush': straight_flush / triples,
+        'three_of_a_kind': trips / triples,
+        'straight': straight / triples,
+        'flush': max(flush, 0.0) / triples,
+    }
+
+def twenty_one_plus_three_ev(counts, pays=TWENTY_ONE_PLUS_3_PAYS):
+    probs = twenty_one_plus_three_probabilities(counts)
+    win = sum(pays[k] * p for k, p in probs.items())
+    return win - (1.0 - sum(probs.values()))
+
+def side_bet_evs(counts, player=None, upcard=None):
+    """
+    Returns {bet: EV} for the current shoe. Perfect Pairs and 21+3 are
+    placed before the deal, so they use counts as given. Insurance and even
+    money need the dealer's Ace out of the shoe: they are included when the
+    upcard is an Ace, with it and the player's cards removed.
+    """
+    evs = {
+        'perfect_pairs': perfect_pairs_ev(counts),
+        '21+3': twenty_one_plus_three_ev(counts),
+    }
+    if upcard == 11:
+        unseen = _remove(counts, [upcard] + list(player or ()))
+        evs['insurance'] = insurance_ev(unseen)
+        if player is not None and sorted(player) == [10, 11]:
+            evs['even_money_decline'] = even_money_decline_ev(unseen)
+    return evs
+
+_LABELS = {'perfect_pairs': 'Perfect Pairs', '21+3': '21+3', 'insurance': 'Insurance',
+           'even_money_decline': 'Decline even money'}
+
+def describe(evs):
+    """
+    Short summary like 'Perfect Pairs -4.1% | 21+3 -3.2%'.
+    """
+    parts = []
+    for key, ev in evs.items():
+        if key == 'even_money_decline':
+            advice = "take even money" if ev < 1.0 else "decline even money"
+            parts.append(f"Blackjack vs A: {advice} ({ev:+.3f} vs +1)")
+        else:
+            parts.append(f"{_LABELS[key]} {ev * 100:+.1f}%")
+    return " | ".join(parts)
@@ -0,0 +1,364 @@
+"""
+Shoe simulation engine.
+
+Deals real N-deck shoes and plays every hand with the advisor's basic
+strategy and Hi-Lo deviations, following the same rules dict used by the
+CLI and GUI ({'s17', 'das', 'surrender'}). Cards are plain integer values
+(2-10, Ace=11) in the inner loop; decisions come from the compiled tables in
+blackjack_advisor, which give the same answers as get_basic_strategy.
+
+Table conditions not covered by the rules dict are fixed: dealer peeks for
+blackjack, blackjack pays 3:2, split up to 4 hands, split aces get one card.
+"""
+import argparse
+import math
+import random
+import time
+import blackjack_advisor as ba
+
+# Hi-Lo tags indexed by card value.
+HILO_TAGS = ba.COUNT_SYSTEMS['hilo']
+
+def build_shoe(num_decks):
+    """
+    Returns an unshuffled shoe as a list of card values.
+    """
+    deck = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11] * 4
+    return deck * num_decks
+
+class SimulationStats:
+    """
+    Streaming per-round results. Units are initial bets, so with a bet ramp
+    a round bet at 4 units that wins counts as +4.
+    """
+    __slots__ = ("rounds", "total", "total_sq", "total_bet", "elapsed")
+
+    def __init__(self):
+        self.rounds = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.total_bet = 0.0
+        self.elapsed = 0.0
+
+    def merge(self, other):
+        self.rounds += other.rounds
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.total_bet += other.total_bet
+        self.elapsed += other.elapsed
+        return self
+
+    @property
+    def ev(self):
+        """Mean result per round, in units."""
+        return self.total / self.rounds if self.rounds else 0.0
+
+    @property
+    def ev_per_bet(self):
+        """Result per unit wagered at the start of each round."""
+        return self.total / self.total_bet if self.total_bet else 0.0
+
+    @property
+    def variance(self):
+        if self.rounds < 2:
+            return 0.0
+        mean = self.ev
+        return (self.total_sq - self.rounds * mean * mean) / (self.rounds - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def hands_per_sec(self):
+        return self.rounds / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return {
+            'rounds': self.rounds,
+            'ev': self.ev,
+            'ev_per_bet': self.ev_per_bet,
+            'variance': self.variance,
+            'std': self.std,
+            'hands_per_sec': self.hands_per_sec,
+        }
+
+def _playable_table(table):
+    """
+    Copies a compiled strategy table and fills the cells the simulator can
+    reach but the table leaves empty:
+      * no-double cells only a two-card hand reaches (e.g. hard 5 after a
+        split without DAS), from their two-card neighbour with DOUBLE
+        played as HIT;
+      * two-card cells only a pair reaches (hard 20 from 10,10), for a pair
+        that can no longer be split, from their no-double neighbour;
+      * hard 4 and soft 12, reached only by an unsplittable 2,2 or A,A,
+        as HIT.
+    Every hard and soft cell a hand can land on then has an action.
+    """
+    table = list(table)
+    for idx in range(0, len(table), 2):
+        if table[idx] is None and table[idx + 1] is not None:
+            action = table[idx + 1]
+            table[idx] = "HIT" if action == "DOUBLE" else action
+        elif table[idx + 1] is None and table[idx] is not None:
+            table[idx + 1] = table[idx]
+    for hand_class, total in ((ba.HAND_HARD, 4), (ba.HAND_SOFT, 12)):
+        for d_val in range(2, 12):
+            for can_double in (0, 1):
+                idx = ba.table_index(hand_class, total, d_val, can_double)
+                if table[idx] is None:
+                    table[idx] = "HIT"
+    return table
+
+def simulate(num_rounds, rules, num_decks=6, penetration=0.75, seed=None,
+             bet_ramp=None, use_deviations=True, insurance_index=3.0,
+             max_hands=4, stats=None, on_round=None, plays=None, shoes=None, tags=None):
+    """
+    Plays num_rounds rounds and returns a SimulationStats.
+
+    bet_ramp maps a true count to a bet in units (flat 1 unit when None).
+    Insurance is taken when the upcard is an Ace and the true count is at
+    least insurance_index (None disables it). on_round, if given, is called
+    as on_round(true_count, bet, result) after every round. plays selects
+    the index set (default blackjack_advisor.DEVIATIONS).
+
+    shoes, if given, is an iterator of pre-shuffled shoes (lists of card
+    values dealt from the end, e.g. shoes.iter_shoes over a pool); each
+    reshuffle takes the next one, falling back to a fresh shuffle once it
+    is exhausted. With num_rounds None, play stops instead when shoes runs
+    out, so every shoe given is played to the cut card and no other.
+
+    tags, if given, counts with these tags (indexed by card value) instead
+    of Hi-Lo; they may be floats, e.g. another system rescaled to the Hi-Lo
+    true-count scale so the same bet ramp and indexes apply.
+    """
+    if num_rounds is None and shoes is None:
+        raise ValueError("num_rounds may only be None when shoes are given")
+    rng = random.Random(seed)
+    shuffle = rng.shuffle
+    s17 = rules.get('s17', True)
+    das = rules.get('das', True)
+
+    first_table = _playable_table(ba.get_strategy_table(rules))
+    split_table = _playable_table(ba.get_strategy_table(dict(rules, surrender=False)))
+    index_table = ba.get_index_table(rules, plays) if use_deviations else None
+    tags = HILO_TAGS if tags is None else tags
+    row = (ba.TABLE_MAX_TOTAL + 1) * 12 * 2
+    soft_base = ba.HAND_SOFT * row
+    pair_base = ba.HAND_PAIR * row
+    index_soft = ba.index_cell(ba.HAND_SOFT, 0, 0)
+    index_pair = ba.index_cell(ba.HAND_PAIR, 0, 0)
+
+    base_shoe = build_shoe(num_decks)
+    # A shuffled spare deck sits under the shoe so a long round past the
+    # cut card can never run out of cards; it is not part of the count.
+    spare = build_shoe(1)
+    reserve = len(spare)
+    cut = int(len(base_shoe) * (1.0 - penetration)) + reserve
+    shoe = []
+    rc = 0
+
+    if stats is None:
+        stats = SimulationStats()
+    start = time.perf_counter()
+    total_won = 0.0
+    total_sq = 0.0
+    total_bet = 0.0
+
+    rounds = 0
+    while num_rounds is None or rounds < num_rounds:
+        if len(shoe) <= cut:
+            shuffle(spare)
+            shoe = next(shoes, None) if shoes is not None else None
+            if shoe is None:
+                if num_rounds is None:
+                    break
+                shoe = base_shoe[:]
+                shuffle(shoe)
+            elif len(shoe) != len(base_shoe):
+                raise ValueError(f"pool shoe has {len(shoe)} cards, expected {len(base_shoe)}")
+            shoe[:0] = spare
+            rc = 0
+        pop = shoe.pop
+        rounds += 1
+
+        round_tc = rc * 52.0 / max(len(shoe) - reserve, 26)
+        bet = bet_ramp(round_tc) if bet_ramp is not None else 1.0
+        total_bet += bet
+
+        p1 = pop(); up = pop(); p2 = pop(); hole = pop()
+        rc += tags[p1] + tags[up] + tags[p2]
+        won = 0.0
+
+        if insurance_index is not None and up == 11:
+            tc = rc * 52.0 / max(len(shoe) - reserve, 26)
+            if tc >= insurance_index:
+                won += bet if hole == 10 else -0.5 * bet
+
+        player_bj = p1 + p2 == 21
+        if up + hole == 21:
+            rc += tags[hole]
+            if not player_bj:
+                won -= bet
+        elif player_bj:
+            rc += tags[hole]
+            won += 1.5 * bet
+        else:
+            hands = [[p1, p2]]
+            done = []  # (total or 0 for bust, bet multiplier) or None for surrender
+            split_hand = False
+            while hands:
+                cards = hands.pop()
+                while True:
+                    total = 0
+                    aces = 0
+                    for c in cards:
+                        total += c
+                        if c == 11:
+                            aces += 1
+                    while total > 21 and aces:
+                        total -= 10
+                        aces -= 1
+                    if total > 21:
+                        done.append((0, 1))
+                        break
+                    n = len(cards)
+                    if split_hand and cards[0] == 11:
+                        done.append((total, 1))  # split aces take one card
+                        break
+
+                    table = split_table if split_hand else first_table
+                    d = up * 2
+                    can_split = n == 2 and cards[0] == cards[1] and len(done) + len(hands) + 1 < max_hands
+                    if can_split:
+                        action = table[pair_base + (cards[0] * 12) * 2 + d + 1]
+                    else:
+                        can_double = n == 2 and (das or not split_hand)
+                        t = total if total < 21 else 21
+                        action = table[(soft_base if aces else 0) + (t * 12) * 2 + d + can_double]
+
+                    if index_table is not None:
+                        candidates = index_table[(index_soft if aces else 0) + total * 12 + up]
+                        if can_split:
+                            candidates = index_table[index_pair + cards[0] * 12 + up] + candidates
+                        if candidates:
+                            tc = rc * 52.0 / max(len(shoe) - reserve, 26)
+                            for play in candidates:
+                                if play.only_from is not None and play.only_from != action:
+                                    continue
+                                if play.initial_only and (n != 2 or split_hand):
+                                    continue
+                                if (tc < play.index) if play.direction == 'below' else (tc >= play.index):
+                                    action = play.action
+                                    break
+
+                    if action == "STAND":
+                        done.append((total, 1))
+                        break
+                    if action == "SURRENDER":
+                        done.append(None)
+                        break
+                    if action == "SPLIT":
+                        # Only reachable through the pair cell or a pair index play,
+                        # both of which require can_split.
+                        c1 = pop(); c2 = pop()
+                        rc += tags[c1] + tags[c2]
+                        hands.append([cards[1], c2])
+                        cards = [cards[0], c1]
+                        split_hand = True
+                        continue
+                    c = pop()
+                    rc += tags[c]
+                    cards.append(c)
+                    if action == "DOUBLE" and n == 2 and (das or not split_hand):
+                        total += c
+                        if c == 11:
+                            aces += 1
+                        while total > 21 and aces:
+                            total -= 10
+                            aces -= 1
+                        done.append((total if total <= 21 else 0, 2))
+                        break
+
+            rc += tags[hole]
+            if any(h is not None and h[0] for h in done):
+                d_total = up + hole
+                d_aces = (up == 11) + (hole == 11)
+                if d_total > 21:
+                    d_total -= 10
+                    d_aces -= 1
+                while d_total < 17 or (d_total == 17 and d_aces and not s17):
+                    c = pop()
+                    rc += tags[c]
+                    d_total += c
+                    if c == 11:
+                        d_aces += 1
+                    if d_total > 21 and d_aces:
+                        d_total -= 10
+                        d_aces -= 1
+                if d_total > 21:
+                    d_total = 1
+            else:
+                d_total = 0
+
+            for h in done:
+                if h is None:
+                    won -= 0.5 * bet
+                elif h[0] == 0 or h[0] < d_total:
+                    won -= h[1] * bet
+                elif h[0] > d_total:
+                    won += h[1] * bet
+
+        total_won += won
+        total_sq += won * won
+        if on_round is not None:
+            on_round(round_tc, bet, won)
+
+    stats.rounds += rounds
+    stats.total += total_won
+    stats.total_sq += total_sq
+    stats.total_bet += total_bet
+    stats.elapsed += time.perf_counter() - start
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the advisor's play over real shoes.")
+    parser.add_argument("-n", "--rounds", type=int, default=1000000)
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("-p", "--penetration", type=float, default=0.75)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    parser.add_argument("--no-deviations", action="store_true", help="Play basic strategy only")
+    parser.add_argument("--pool", help="Deal from a shoe pool built by shoes.py")
+    parser.add_argument("--index-set", help="Index plays to use: a set name from deviations.py or a saved JSON file")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    pool_shoes = None
+    if args.pool:
+        import shoes
+        pool = shoes.load_pool(args.pool)
+        args.decks = shoes.pool_decks(pool)
+        pool_shoes = shoes.iter_shoes(pool)
+    plays = None
+    if args.index_set:
+        import deviations
+        try:
+            plays = deviations.resolve_index_set(args.index_set)
+        except ValueError as e:
+            parser.error(str(e))
+    stats = simulate(args.rounds, rules, num_decks=args.decks, penetration=args.penetration,
+                     seed=args.seed, use_deviations=not args.no_deviations, shoes=pool_shoes,
+                     plays=plays)
+    s = stats.summary()
+    print(f" {'Rounds':<20}: {s['rounds']}")
+    print(f" {'EV per round':<20}: {s['ev'] * 100:+.3f}%")
+    print(f" {'Std dev':<20}: {s['std']:.4f}")
+    print(f" {'Variance':<20}: {s['variance']:.4f}")
+    print(f" {'Hands/sec':<20}: {s['hands_per_sec']:.0f}")
+
+if __name__ == "__main__":
+    main()
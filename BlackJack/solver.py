@@ -0,0 +1,338 @@
+"""
+Rule-parametric basic strategy solver.
+
+Estimates expected values for STAND, HIT, DOUBLE, SPLIT and SURRENDER from a
+shoe composition, for any deck count and rules dict, and turns them into a
+strategy table laid out exactly like blackjack_advisor.compile_strategy_table
+so it can be served by the same lookups.
+
+A composition is a tuple of 12 card counts indexed by card value (2-10,
+Ace=11; slots 0 and 1 are unused). The dealer's final-total distribution is
+memoized per (composition, upcard, rules). The dealer peeks for blackjack,
+so with an Ace or ten up its hole card is conditioned on not making 21.
+
+The EVs are an approximation, not a combinatorial analysis:
+  * every later card, the player's and the dealer's, is drawn from the
+    composition left after the initial cards, with no further depletion;
+  * a pair splits once (no resplitting); split aces get one card each.
+Exact EVs (depleting the shoe along every draw, with resplits) are out of
+scope: the player and dealer trees then differ for every composition
+reached, which is far too slow in pure Python for per-hand advice
+(composition.py) and index derivation (deviations.py). Callers present
+these numbers as estimates.
+"""
+import time
+from functools import lru_cache
+import blackjack_advisor as ba
+
+CARD_VALUES = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+DEALER_TOTALS = (17, 18, 19, 20, 21)  # dealer outcome index 5 is bust
+
+def shoe_composition(num_decks):
+    """
+    Returns the composition tuple of a full N-deck shoe.
+    """
+    counts = [0] * 12
+    for v in CARD_VALUES:
+        counts[v] = 4 * num_decks
+    counts[10] = 16 * num_decks
+    return tuple(counts)
+
+def remove_cards(counts, values):
+    """
+    Returns a composition with the given card values taken out.
+    """
+    counts = list(counts)
+    for v in values:
+        counts[v] -= 1
+    return tuple(counts)
+
+def _probabilities(counts):
+    n = sum(counts)
+    return [c / n for c in counts]
+
+def _add_card(h, has_ace, v):
+    # h is the hard total with every ace counted as 1.
+    if v == 11:
+        return h + 1, True
+    return h + v, has_ace
+
+def _best_total(h, has_ace):
+    return h + 10 if has_ace and h <= 11 else h
+
+@lru_cache(maxsize=4096)
+def dealer_distribution(counts, upcard, s17=True, peek=True):
+    """
+    Returns the dealer's final-total probabilities as a 6-tuple:
+    P(17), P(18), P(19), P(20), P(21), P(bust).
+    With peek, the result is conditioned on the dealer not holding blackjack.
+    """
+    p = _probabilities(counts)
+    memo = {}
+
+    def finish(h, has_ace):
+        key = (h, has_ace)
+        if key in memo:
+            return memo[key]
+        total = _best_total(h, has_ace)
+        if total > 21:
+            dist = (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        elif total >= 17 and not (total == 17 and not s17 and has_ace and h <= 11):
+            dist = tuple(1.0 if t == total else 0.0 for t in DEALER_TOTALS) + (0.0,)
+        else:
+            acc = [0.0] * 6
+            for v in CARD_VALUES:
+                if p[v]:
+                    sub = finish(*_add_card(h, has_ace, v))
+                    for i in range(6):
+                        acc[i] += p[v] * sub[i]
+            dist = tuple(acc)
+        memo[key] = dist
+        return dist
+
+    h, has_ace = _add_card(0, False, upcard)
+    blackjack_hole = {11: 10, 10: 11}.get(upcard) if peek else None
+    acc = [0.0] * 6
+    weight = 0.0
+    for v in CARD_VALUES:
+        if not p[v] or v == blackjack_hole:
+            continue
+        sub = finish(*_add_card(h, has_ace, v))
+        weight += p[v]
+        for i in range(6):
+            acc[i] += p[v] * sub[i]
+    return tuple(x / weight for x in acc)
+
+def _stand_evs(dist):
+    """
+    Returns a list indexed by player total (0-21) of the EV of standing.
+    """
+    bust = dist[5]
+    evs = []
+    for t in range(22):
+        ev = bust
+        for i, d in enumerate(DEALER_TOTALS):
+            if t > d:
+                ev += dist[i]
+            elif t < d:
+                ev -= dist[i]
+        evs.append(ev)
+    return evs
+
+class HandEvaluator:
+    """
+    Player EVs for one (composition, upcard, rules) situation. Hit values are
+    memoized per hard total and ace flag, so every hand evaluated against the
+    same composition shares the work.
+    """
+
+    def __init__(self, counts, upcard, rules):
+        self.p = _probabilities(counts)
+        self.rules = rules
+        dist = dealer_distribution(counts, upcard, ba.rules_key(rules)[0])
+        self.stand_by_total = _stand_evs(dist)
+        self._optimal = {}
+
+    def stand(self, h, has_ace):
+        total = _best_total(h, has_ace)
+        return -1.0 if total > 21 else self.stand_by_total[total]
+
+    def hit(self, h, has_ace):
+        p = self.p
+        ev = 0.0
+        for v in CARD_VALUES:
+            if p[v]:
+                ev += p[v] * self.optimal(*_add_card(h, has_ace, v))
+        return ev
+
+    def optimal(self, h, has_ace):
+        """EV of playing on with only STAND or HIT available."""
+        key = (h, has_ace)
+        ev = self._optimal.get(key)
+        if ev is None:
+            if _best_total(h, has_ace) > 21:
+                ev = -1.0
+            else:
+                ev = max(self.stand(h, has_ace), self.hit(h, has_ace))
+            self._optimal[key] = ev
+        return ev
+
+    def double(self, h, has_ace):
+        p = self.p
+        ev = 0.0
+        for v in CARD_VALUES:
+            if p[v]:
+                ev += p[v] * self.stand(*_add_card(h, has_ace, v))
+        return 2.0 * ev
+
+    def split(self, pair_value):
+        """EV of splitting a pair into two hands, no resplitting."""
+        p = self.p
+        das = ba.rules_key(self.rules)[1]
+        h0, a0 = _add_card(0, False, pair_value)
+        ev = 0.0
+        for v in CARD_VALUES:
+            if not p[v]:
+                continue
+            h, a = _add_card(h0, a0, v)
+            if pair_value == 11:
+                hand_ev = self.stand(h, a)
+            else:
+                hand_ev = self.optimal(h, a)
+                if das:
+                    hand_ev = max(hand_ev, self.double(h, a))
+            ev += p[v] * hand_ev
+        return 2.0 * ev
+
+    def action_evs(self, h, has_ace, two_cards=True, pair_value=None):
+        """
+        Returns {action: EV} for every action allowed on this hand.
+        """
+        evs = {"STAND": self.stand(h, has_ace), "HIT": self.hit(h, has_ace)}
+        if two_cards:
+            evs["DOUBLE"] = self.double(h, has_ace)
+            if self.rules.get('surrender', False):
+                evs["SURRENDER"] = -0.5
+            if pair_value is not None:
+                evs["SPLIT"] = self.split(pair_value)
+        return evs
+
+def _hand_state(values):
+    h, a = 0, False
+    for v in values:
+        h, a = _add_card(h, a, v)
+    return h, a
+
+def best_action(evs):
+    """
+    Returns the action with the highest EV; ties go to the simpler play.
+    """
+    order = ("STAND", "HIT", "DOUBLE", "SPLIT", "SURRENDER")
+    return max((a for a in order if a in evs), key=lambda a: evs[a])
+
+def _two_card_hands():
+    for i, v1 in enumerate(CARD_VALUES):
+        for v2 in CARD_VALUES[i:]:
+            yield v1, v2
+
+def _weighted_mean(acc, weight):
+    return {a: ev / weight for a, ev in acc.items()}
+
+@lru_cache(maxsize=64)
+def _solve(key, num_decks):
+    s17, das, surrender = key
+    rules = {'s17': s17, 'das': das, 'surrender': surrender}
+    shoe = shoe_composition(num_decks)
+    cells = {}
+
+    for up in CARD_VALUES:
+        after_up = remove_cards(shoe, (up,))
+        n = sum(after_up)
+
+        # Two-card cells: pairs get their own cell, hard/soft totals are the
+        # probability-weighted mean over every two-card hand making them.
+        sums = {}
+        for v1, v2 in _two_card_hands():
+            counts = remove_cards(after_up, (v1, v2))
+            if min(counts[v1], counts[v2]) < 0:
+                continue
+            weight = after_up[v1] / n * (after_up[v2] - (v1 == v2)) / (n - 1)
+            if v1 != v2:
+                weight *= 2
+            h, a = _hand_state((v1, v2))
+            total = _best_total(h, a)
+            if total == 21:
+                continue  # a natural is paid before any decision
+            evaluator = HandEvaluator(counts, up, rules)
+            if v1 == v2:
+                evs = evaluator.action_evs(h, a, pair_value=v1)
+                cells[ba.table_index(ba.HAND_PAIR, v1, up, 1)] = evs
+                continue
+            hand_class = ba.HAND_SOFT if a and h <= 11 else ba.HAND_HARD
+            idx = ba.table_index(hand_class, total, up, 1)
+            acc, w = sums.get(idx, ({}, 0.0))
+            for action, ev in evaluator.action_evs(h, a).items():
+                acc[action] = acc.get(action, 0.0) + weight * ev
+            sums[idx] = (acc, w + weight)
+        for idx, (acc, w) in sums.items():
+            cells[idx] = _weighted_mean(acc, w)
+
+        # Three-or-more-card cells only depend on the total and the upcard.
+        evaluator = HandEvaluator(after_up, up, rules)
+        for total in range(6, ba.TABLE_MAX_TOTAL + 1):
+            cells[ba.table_index(ba.HAND_HARD, total, up, 0)] = evaluator.action_evs(total, False, two_cards=False)
+        for total in range(13, 22):
+            cells[ba.table_index(ba.HAND_SOFT, total, up, 0)] = evaluator.action_evs(total - 10, True, two_cards=False)
+    return cells
+
+def solve_ev_table(rules, num_decks=6):
+    """
+    Returns {table index: {action: EV}} for every reachable strategy cell,
+    using the blackjack_advisor.table_index layout. EVs are per initial bet
+    and carry the approximations described in the module docstring.
+    """
+    return _solve(ba.rules_key(rules), num_decks)
+
+def solve_strategy_table(rules, num_decks=6):
+    """
+    Returns a strategy table (same layout as compile_strategy_table) holding
+    the highest-EV action for every reachable cell.
+    """
+    table = [None] * ba.table_index(ba.HAND_PAIR + 1, 0, 0, 0)
+    for idx, evs in solve_ev_table(rules, num_decks).items():
+        table[idx] = best_action(evs)
+    return table
+
+def composition_action_evs(player_hand, dealer_upcard, counts, rules):
+    """
+    Approximate EVs (see the module docstring) for a specific hand against
+    an arbitrary remaining-shoe composition (cards already removed). Hands
+    take card values or card strings.
+    Returns {action: EV}.
+    """
+    values = [ba._CARD_VALUES[c] if isinstance(c, str) else c for c in player_hand]
+    up = ba._CARD_VALUES[dealer_upcard] if isinstance(dealer_upcard, str) else dealer_upcard
+    h, a = _hand_state(values)
+    two_cards = len(values) == 2
+    pair_value = values[0] if two_cards and values[0] == values[1] else None
+    return HandEvaluator(counts, up, rules).action_evs(h, a, two_cards, pair_value)
+
+def describe_cell(idx):
+    """
+    Returns a readable label such as 'soft 18 vs 6' for a table index.
+    """
+    idx, can_double = divmod(idx, 2)
+    idx, d_val = divmod(idx, 12)
+    hand_class, total = divmod(idx, ba.TABLE_MAX_TOTAL + 1)
+    up = 'A' if d_val == 11 else str(d_val)
+    if hand_class == ba.HAND_PAIR:
+        card = 'A' if total == 11 else str(total)
+        return f"{card},{card} vs {up}"
+    name = "soft" if hand_class == ba.HAND_SOFT else "hard"
+    suffix = "" if can_double else " (3+ cards)"
+    return f"{name} {total} vs {up}{suffix}"
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Solve basic strategy and compare it with the built-in chart.")
+    parser.add_argument("-d", "--decks", type=int, default=6)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--no-das", action="store_true", help="No double after split")
+    parser.add_argument("--no-surrender", action="store_true", help="No late surrender")
+    args = parser.parse_args()
+
+    rules = {'s17': not args.h17, 'das': not args.no_das, 'surrender': not args.no_surrender}
+    start = time.perf_counter()
+    solved = solve_strategy_table(rules, args.decks)
+    elapsed = time.perf_counter() - start
+
+    evs = solve_ev_table(rules, args.decks)
+    chart = ba.get_strategy_table(rules)
+    print(f"Solved {len(evs)} cells in {elapsed * 1000:.0f} ms")
+    for idx, action in enumerate(solved):
+        if action is not None and chart[idx] is not None and chart[idx] != action:
+            cost = evs[idx][action] - evs[idx].get(chart[idx], float('nan'))
+            print(f"  {describe_cell(idx):<24} chart {chart[idx]:<9} solver {action:<9} (+{cost:.4f})")
+
+if __name__ == "__main__":
+    main()
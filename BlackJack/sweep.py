@@ -0,0 +1,221 @@
+"""
+Game-condition parameter sweep.
+
+Simulates every combination of deck count, S17/H17, DAS, surrender and
+penetration in a grid and reports EV, standard deviation and SCORE per
+condition. Each condition is split into shards of rounds; shards run on a
+process pool and every finished shard is written straight to the result
+cache in the cache directory ($BLACKJACK_CACHE_DIR, default
+~/.cache/blackjack-advisor), so an interrupted sweep resumes where it
+stopped and a widened grid only simulates the new cells.
+
+A condition's rounds are cut into fixed blocks of --shard-rounds plus one
+smaller remainder shard. A shard's cache name is hashed from its
+condition, seed, bet ramp, its index and size, SWEEP_VERSION and a
+fingerprint of the simulator, blackjack_advisor and deviations sources -
+not from the total rounds - so raising -n reuses every full shard already
+simulated, while results from older code or a different shard size are
+never reused.
+
+SCORE is the win per 100 rounds, in units, for a 10,000-unit bankroll bet
+at full Kelly: 1e6 * (EV / SD)^2 with EV and SD per round, negative when
+the condition loses.
+
+Usage:
+    python sweep.py --decks 2 6 8 --dealer s17 h17 --penetration 0.75 0.83
+    python sweep.py --decks 6 --das on off --surrender on off --flat --csv out.csv
+"""
+import argparse
+import csv
+import hashlib
+import inspect
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import bet_ramp
+import blackjack_advisor as ba
+import deviations
+import simulator
+
+SWEEP_VERSION = 1
+
+CACHE_DIR = os.path.join(os.environ.get("BLACKJACK_CACHE_DIR",
+                                        os.path.join(os.path.expanduser("~"), ".cache", "blackjack-advisor")),
+                         "sweeps")
+
+FLAT_RAMP = bet_ramp.BetRamp((), (1,))
+
+_fingerprint = None
+
+def _code_fingerprint():
+    global _fingerprint
+    if _fingerprint is None:
+        # The simulator plays from blackjack_advisor's strategy and index
+        # tables, and deviations.py holds the index sets they are built from.
+        digest = hashlib.sha256()
+        for module in (simulator, ba, deviations):
+            digest.update(inspect.getsource(module).encode())
+        _fingerprint = digest.hexdigest()[:16]
+    return _fingerprint
+
+def grid(decks=(6,), s17=(True,), das=(True,), surrender=(True,), penetration=(0.75,)):
+    """
+    Returns every condition in the grid as (num_decks, rules, penetration).
+    """
+    return [(d, {'s17': a, 'das': b, 'surrender': c}, p)
+            for d, a, b, c, p in itertools.product(decks, s17, das, surrender, penetration)]
+
+def shard_key(num_decks, rules, penetration, seed, ramp, shard, shard_rounds):
+    ident = json.dumps({
+        'decks': num_decks, 'rules': {k: bool(rules.get(k)) for k in ('s17', 'das', 'surrender')},
+        'penetration': penetration, 'seed': seed, 'ramp': ramp.to_dict(),
+        'shard': shard, 'shard_rounds': shard_rounds, 'version': SWEEP_VERSION, 'code': _code_fingerprint(),
+    }, sort_keys=True)
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key + ".json")
+
+def load_shard(key):
+    """
+    Returns a cached shard's SimulationStats, or None.
+    """
+    try:
+        with open(_path(key)) as f:
+            d = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stats = simulator.SimulationStats()
+    stats.rounds, stats.total, stats.total_sq = d['rounds'], d['total'], d['total_sq']
+    stats.total_bet, stats.elapsed = d['total_bet'], d['elapsed']
+    return stats
+
+def save_shard(key, stats):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({'rounds': stats.rounds, 'total': stats.total, 'total_sq': stats.total_sq,
+                       'total_bet': stats.total_bet, 'elapsed': stats.elapsed}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # the cache is an optimisation only
+
+def _run_shard(args):
+    rounds, rules, num_decks, penetration, seed, ramp_dict = args
+    ramp = bet_ramp.BetRamp.from_dict(ramp_dict)
+    return simulator.simulate(rounds, rules, num_decks=num_decks, penetration=penetration,
+                              seed=seed, bet_ramp=ramp.units_for if ramp.thresholds else None)
+
+def score(ev, std):
+    # Kept signed so a losing condition does not look like a good one.
+    return math.copysign(1e6 * (ev / std) ** 2, ev) if std else 0.0
+
+def run_sweep(conditions, rounds=1000000, shard_rounds=250000, ramp=bet_ramp.DEFAULT_RAMP,
+              seed=1, workers=None, progress=None):
+    """
+    Simulates every (num_decks, rules, penetration) condition, reusing
+    cached shards. progress, if given, is called as progress(done, total)
+    after every shard. Returns one result dict per condition, in order.
+    """
+    # Fixed-size blocks, then the remainder: growing rounds keeps the
+    # earlier blocks (and their cache keys) unchanged.
+    sizes = [shard_rounds] * (rounds // shard_rounds)
+    if rounds % shard_rounds:
+        sizes.append(rounds % shard_rounds)
+    shards = len(sizes)
+    cells = []
+    pending = {}
+    for num_decks, rules, penetration in conditions:
+        stats = simulator.SimulationStats()
+        cells.append((num_decks, rules, penetration, stats))
+        for shard, n in enumerate(sizes):
+            key = shard_key(num_decks, rules, penetration, seed, ramp, shard, n)
+            cached = load_shard(key)
+            if cached is not None:
+                stats.merge(cached)
+                continue
+            pending[key] = (stats, (n, rules, num_decks, penetration, f"{seed}/{key}", ramp.to_dict()))
+
+    total = len(cells) * shards
+    done = total - len(pending)
+    if progress is not None:
+        progress(done, total)
+
+    def finish(key, result):
+        nonlocal done
+        save_shard(key, result)
+        pending[key][0].merge(result)
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for key, (_, job) in list(pending.items()):
+            finish(key, _run_shard(job))
+    elif pending:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(_run_shard, job): key for key, (_, job) in pending.items()}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+    results = []
+    for num_decks, rules, penetration, stats in cells:
+        results.append({
+            'decks': num_decks, 's17': rules['s17'], 'das': rules['das'],
+            'surrender': rules['surrender'], 'penetration': penetration,
+            'rounds': stats.rounds, 'ev': stats.ev, 'ev_per_bet': stats.ev_per_bet,
+            'std': stats.std, 'score': score(stats.ev, stats.std),
+        })
+    return results
+
+def _switch(values):
+    return tuple(v == "on" for v in values)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep game conditions and report EV, SD and SCORE.")
+    parser.add_argument("-d", "--decks", type=int, nargs="+", default=[6])
+    parser.add_argument("--dealer", nargs="+", choices=["s17", "h17"], default=["s17"])
+    parser.add_argument("--das", nargs="+", choices=["on", "off"], default=["on"])
+    parser.add_argument("--surrender", nargs="+", choices=["on", "off"], default=["on"])
+    parser.add_argument("-p", "--penetration", type=float, nargs="+", default=[0.75])
+    parser.add_argument("-n", "--rounds", type=int, default=1000000, help="Rounds per condition")
+    parser.add_argument("--shard-rounds", type=int, default=250000, help="Rounds per cached shard")
+    parser.add_argument("--flat", action="store_true", help="Flat 1-unit bets instead of the 1-5 ramp")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--csv", help="Also write the table to this CSV file")
+    args = parser.parse_args()
+
+    conditions = grid(args.decks, tuple(d == "s17" for d in args.dealer), _switch(args.das),
+                      _switch(args.surrender), args.penetration)
+    ramp = FLAT_RAMP if args.flat else bet_ramp.DEFAULT_RAMP
+    start = time.perf_counter()
+
+    def progress(done, total):
+        sys.stderr.write(f"\r {done}/{total} shards")
+        sys.stderr.flush()
+
+    results = run_sweep(conditions, args.rounds, args.shard_rounds, ramp, args.seed, args.workers, progress)
+    sys.stderr.write(f"\r {len(results)} conditions in {time.perf_counter() - start:.1f} s\n")
+
+    print(f" {'Decks':>5} {'Dealer':<6} {'DAS':<4} {'LS':<4} {'Pen':>5} {'Rounds':>9} "
+          f"{'EV':>8} {'EV/bet':>8} {'SD':>6} {'SCORE':>7}")
+    for r in results:
+        print(f" {r['decks']:>5} {'S17' if r['s17'] else 'H17':<6} {'yes' if r['das'] else 'no':<4} "
+              f"{'yes' if r['surrender'] else 'no':<4} {r['penetration']:>5.0%} {r['rounds']:>9} "
+              f"{r['ev'] * 100:>+7.3f}% {r['ev_per_bet'] * 100:>+7.3f}% {r['std']:>6.3f} {r['score']:>7.2f}")
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+if __name__ == "__main__":
+    main()
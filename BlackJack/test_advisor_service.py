@@ -0,0 +1,94 @@
+"""
+Error paths of AdvisorService.handle: every request gets a reply dict.
+
+Run from this directory:
+    python -m unittest test_advisor_service
+"""
+import asyncio
+import json
+import unittest
+from advisor_service import AdvisorService
+
+class HandleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = AdvisorService()
+
+    def assertError(self, request, fragment):
+        reply = self.service.handle(request)
+        self.assertFalse(reply['ok'], reply)
+        self.assertIn(fragment, reply['error'])
+        return reply
+
+    def test_not_an_object(self):
+        self.assertError([1, 2], "JSON object")
+
+    def test_op_not_a_string(self):
+        self.assertError({'op': []}, "op must be a string")
+        self.assertError({'op': {'a': 1}}, "op must be a string")
+        self.assertError({}, "op must be a string")
+
+    def test_unknown_op_keeps_id(self):
+        reply = self.assertError({'op': 'nope', 'id': 7}, "unknown op")
+        self.assertEqual(reply['id'], 7)
+
+    def test_decks_overflow(self):
+        self.assertError({'op': 'open', 'decks': 1e999}, "")
+        self.assertError({'op': 'open', 'decks': "six"}, "")
+        self.assertError({'op': 'open', 'decks': -1}, "at least 1")
+
+    def test_numeric_session_id(self):
+        reply = self.service.handle({'op': 'open', 'session': 5})
+        self.assertTrue(reply['ok'], reply)
+        self.assertEqual(reply['session'], "5")
+        for request in ({'op': 'status', 'session': 5}, {'op': 'status', 'session': "5"},
+                        {'op': 'cards', 'session': 5, 'cards': "10 A"}):
+            self.assertTrue(self.service.handle(request)['ok'], request)
+        self.assertTrue(self.service.handle({'op': 'close', 'session': 5})['ok'])
+        self.assertError({'op': 'status', 'session': "5"}, "no such session")
+
+    def test_bad_session_id(self):
+        self.assertError({'op': 'status'}, "missing session")
+        self.assertError({'op': 'status', 'session': [1]}, "session must be a string")
+        self.assertError({'op': 'open', 'session': True}, "session must be a string")
+        self.assertError({'op': 'close', 'session': "nope"}, "no such session")
+
+    def test_rules_must_be_booleans(self):
+        self.assertError({'op': 'open', 'rules': {'das': "false"}}, "true or false")
+        self.assertError({'op': 'open', 'rules': {'das': 0}}, "true or false")
+        self.assertError({'op': 'open', 'rules': {'peek': True}}, "unknown rules")
+        self.assertError({'op': 'open', 'rules': []}, "must be an object")
+        reply = self.service.handle({'op': 'open', 'rules': {'das': False}})
+        self.assertTrue(reply['ok'], reply)
+        self.assertFalse(self.service.sessions[reply['session']].rules['das'])
+
+    def test_advise_errors(self):
+        sid = self.service.handle({'op': 'open'})['session']
+        self.assertError({'op': 'advise', 'session': sid, 'player': "10", 'upcard': "6"}, "at least 2")
+        self.assertError({'op': 'advise', 'session': sid, 'player': "10 6", 'upcard': ""}, "exactly 1")
+        reply = self.service.handle({'op': 'advise', 'session': sid, 'player': "10 6", 'upcard': "10"})
+        self.assertTrue(reply['ok'], reply)
+
+class ServeClientTest(unittest.TestCase):
+
+    def test_bad_requests_get_replies(self):
+        lines = [b'{"op": []}', b'{"op": "open", "decks": 1e999}', b'not json',
+                 b'{"op": "open", "session": 5}', b'{"op": "status", "session": 5}']
+
+        async def run():
+            server = await asyncio.start_server(AdvisorService().serve_client, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"\n".join(lines) + b"\n")
+                await writer.drain()
+                replies = [json.loads(await reader.readline()) for _ in lines]
+                writer.close()
+                await writer.wait_closed()
+            return replies
+
+        replies = asyncio.run(run())
+        self.assertEqual([r['ok'] for r in replies], [False, False, False, True, True])
+
+if __name__ == "__main__":
+    unittest.main()
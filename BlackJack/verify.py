@@ -0,0 +1,321 @@
+"""
+Exhaustive verification harness for the strategy functions.
+
+Enumerates every reachable decision state - each multiset of 2..N player
+cards totalling 21 or less, every upcard, every rule set and a range of
+true counts - and checks:
+
+  * candidates: each fast implementation (apply_deviations, compiled
+    table lookup, encoded input, numpy batch, or any --candidate
+    module:function) must return the same action as the reference:
+    get_basic_strategy plus oracle_deviations, which walks the index plays
+    one by one instead of using the compiled deviation tables;
+  * legality: the reference never doubles, splits or surrenders where the
+    hand or rules do not allow it;
+  * playability: the simulator's tables have an action for every hard or
+    soft cell a hand can land on, with and without doubling - including a
+    pair that can no longer be split (10,10 at the hand limit);
+  * solver EV: the reference basic action is compared with the solver's
+    best action per strategy cell, and the EV given up is reported. The
+    solver's EVs are estimates (no depletion after the initial cards, no
+    resplits; see solver.py), so small costs are not conclusive.
+
+The sweep is sharded by (rules, upcard) over a process pool.
+
+Usage:
+    python verify.py                          # full sweep, all cores
+    python verify.py --candidate mymod:decide --report report.json
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import blackjack_advisor as ba
+import simulator
+import solver
+
+ALL_RULES = [{'s17': s17, 'das': das, 'surrender': surrender}
+             for s17 in (True, False) for das in (True, False) for surrender in (True, False)]
+UPCARDS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'A')
+# Half-step true counts so every index is hit exactly and just either side.
+TRUE_COUNTS = tuple(tc / 2.0 for tc in range(-12, 17))
+MAX_EXAMPLES = 20
+
+# ---------------------------------------------------------------------------
+# Candidates: f(player_hand, dealer_upcard, rules, true_count) -> action
+# ---------------------------------------------------------------------------
+
+def oracle_deviations(basic_action, player_hand, dealer_upcard, true_count, rules, plays=ba.DEVIATIONS):
+    """
+    Applies an index set the slow, obvious way: pair plays first, then the
+    plays for the hand's hard/soft total, each in listed order, checking
+    every condition of every play directly. Shares no tables with
+    apply_deviations, so the two check each other.
+    """
+    up = ba.get_card_value(dealer_upcard)
+    total, soft, pair = ba.calculate_hand(player_hand)
+    two_cards = len(player_hand) == 2
+    pair_value = ba.get_card_value(player_hand[0]) if two_cards and pair else None
+    hand_class = ba.HAND_SOFT if soft else ba.HAND_HARD
+    for want_pair in (True, False):
+        for play in plays:
+            if want_pair:
+                if play.hand_class != ba.HAND_PAIR or play.total != pair_value:
+                    continue
+            elif play.hand_class != hand_class or play.total != total:
+                continue
+            if play.upcard != up or not ba.play_applies_to_rules(play, rules):
+                continue
+            if play.initial_only and not two_cards:
+                continue
+            if play.only_from is not None and play.only_from != basic_action:
+                continue
+            if play.direction == 'below':
+                if true_count < play.index:
+                    return play.action
+            elif true_count >= play.index:
+                return play.action
+    return basic_action
+
+def reference(player_hand, dealer_upcard, rules, true_count):
+    basic = ba.get_basic_strategy(player_hand, dealer_upcard, rules)
+    return oracle_deviations(basic, player_hand, dealer_upcard, true_count, rules)
+
+def deviations(player_hand, dealer_upcard, rules, true_count):
+    basic = ba.get_basic_strategy(player_hand, dealer_upcard, rules)
+    return ba.apply_deviations(basic, player_hand, dealer_upcard, true_count, rules)[0]
+
+def lookup(player_hand, dealer_upcard, rules, true_count):
+    basic = ba.lookup_basic_strategy(player_hand, dealer_upcard, rules)
+    return ba.apply_deviations(basic, player_hand, dealer_upcard, true_count, rules)[0]
+
+def lookup_encoded(player_hand, dealer_upcard, rules, true_count):
+    hand = ba.encode_cards(player_hand)
+    up = ba.get_card_value(dealer_upcard)
+    basic = ba.lookup_basic_strategy(hand, up, rules)
+    return ba.apply_deviations(basic, hand, up, true_count, rules)[0]
+
+CANDIDATES = {
+    'apply_deviations': deviations,
+    'lookup': lookup,
+    'lookup_encoded': lookup_encoded,
+}
+
+def load_candidate(spec):
+    """
+    Resolves 'module:function' to a callable.
+    """
+    module_name, _, func_name = spec.partition(":")
+    if not func_name:
+        raise ValueError(f"candidate {spec!r} must look like module:function")
+    return getattr(importlib.import_module(module_name), func_name)
+
+# ---------------------------------------------------------------------------
+# Sweep
+# ---------------------------------------------------------------------------
+
+def reachable_hands(max_cards=5):
+    """
+    Every player hand (as card strings) of 2..max_cards cards that has not busted.
+    """
+    return [hand for hand in ba._sample_hands(max_cards) if ba.calculate_hand(hand)[0] <= 21]
+
+def illegal_reason(action, player_hand, rules):
+    two_cards = len(player_hand) == 2
+    if action == "DOUBLE" and not two_cards:
+        return "double on 3+ cards"
+    if action == "SPLIT" and not (two_cards and ba.get_card_value(player_hand[0]) == ba.get_card_value(player_hand[1])):
+        return "split on a non-pair"
+    if action == "SURRENDER" and not (two_cards and rules.get('surrender', False)):
+        return "surrender not allowed"
+    return None
+
+def unplayable_cells(hand, up_val, tables):
+    """
+    Yields the simulator cells (hard/soft, ignoring any pair) a hand can
+    be looked up in that have no action. Two-card hands, pairs included,
+    are checked with and without doubling, since a pair past the hand limit
+    or a hand after a split without DAS is played from the same cell.
+    """
+    total, soft, _ = ba.calculate_hand(hand)
+    hand_class = ba.HAND_SOFT if soft else ba.HAND_HARD
+    for name, table in tables.items():
+        for can_double in ((0, 1) if len(hand) == 2 else (0,)):
+            if table[ba.table_index(hand_class, total, up_val, can_double)] is None:
+                yield name, can_double
+
+def rules_text(rules):
+    s17, das, surrender = ba.rules_key(rules)
+    return f"{'S17' if s17 else 'H17'} {'DAS' if das else 'NDAS'} {'LS' if surrender else 'NS'}"
+
+def _run_shard(args):
+    rules, upcard, hands, true_counts, candidate_specs, num_decks, use_batch = args
+    candidates = {name: CANDIDATES[name] for name in CANDIDATES}
+    for spec in candidate_specs:
+        candidates[spec] = load_candidate(spec)
+
+    result = {
+        'states': 0,
+        'mismatches': {name: 0 for name in candidates},
+        'examples': {name: [] for name in candidates},
+        'illegal': {},
+        'unplayable': {},
+        'cells': {},
+    }
+    if use_batch:
+        result['mismatches']['batch'] = 0
+        result['examples']['batch'] = []
+
+    evs = solver.solve_ev_table(rules, num_decks)
+    up_val = ba.get_card_value(upcard)
+    sim_tables = {
+        'first': simulator._playable_table(ba.get_strategy_table(rules)),
+        'split': simulator._playable_table(ba.get_strategy_table(dict(rules, surrender=False))),
+    }
+    expected = []
+
+    for hand in hands:
+        basic = ba.get_basic_strategy(hand, upcard, rules)
+
+        # Legality and solver EV are count-independent: once per cell.
+        reason = illegal_reason(basic, hand, rules)
+        if reason:
+            key = f"{' '.join(hand)} vs {upcard}: {basic} ({reason})"
+            result['illegal'][key] = result['illegal'].get(key, 0) + 1
+        for name, can_double in unplayable_cells(hand, up_val, sim_tables):
+            key = f"{' '.join(hand)} vs {upcard}: {name} table, can_double={can_double}"
+            result['unplayable'][key] = result['unplayable'].get(key, 0) + 1
+        hand_class, total, can_double = ba.hand_key(hand)
+        idx = ba.table_index(hand_class, total, up_val, can_double)
+        cell = evs.get(idx)
+        if cell and idx not in result['cells']:
+            best = solver.best_action(cell)
+            if basic in cell and basic != best:
+                result['cells'][idx] = (basic, best, cell[best] - cell[basic])
+
+        for tc in true_counts:
+            want = oracle_deviations(basic, hand, upcard, tc, rules)
+            expected.append(want)
+            result['states'] += 1
+            for name, func in candidates.items():
+                got = func(hand, upcard, rules, tc)
+                if got != want:
+                    result['mismatches'][name] += 1
+                    if len(result['examples'][name]) < MAX_EXAMPLES:
+                        result['examples'][name].append(
+                            f"{' '.join(hand)} vs {upcard} TC {tc:+.1f} {rules_text(rules)}: "
+                            f"reference {want}, got {got}")
+
+    if use_batch:
+        import numpy as np
+        import batch_advisor as bat
+        rows = [(hand, tc) for hand in hands for tc in true_counts]
+        encoded = bat.encode_hands([hand for hand, _ in rows])
+        ups = np.full(len(rows), up_val, dtype=np.int8)
+        tcs = np.array([tc for _, tc in rows])
+        got = bat.decode_actions(bat.batch_decide(encoded, ups, tcs, rules))
+        for (hand, tc), want, action in zip(rows, expected, got):
+            if action != want:
+                result['mismatches']['batch'] += 1
+                if len(result['examples']['batch']) < MAX_EXAMPLES:
+                    result['examples']['batch'].append(
+                        f"{' '.join(hand)} vs {upcard} TC {tc:+.1f} {rules_text(rules)}: "
+                        f"reference {want}, got {action}")
+    return rules, result
+
+def _batch_available():
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def verify(max_cards=5, true_counts=TRUE_COUNTS, candidate_specs=(), num_decks=6,
+           workers=None, rules_list=ALL_RULES, use_batch=None):
+    """
+    Runs the sweep and returns a report dict.
+    """
+    if use_batch is None:
+        use_batch = _batch_available()
+    hands = reachable_hands(max_cards)
+    jobs = [(rules, up, hands, tuple(true_counts), tuple(candidate_specs), num_decks, use_batch)
+            for rules in rules_list for up in UPCARDS]
+
+    report = {'states': 0, 'mismatches': {}, 'examples': {}, 'illegal': {}, 'unplayable': {}, 'ev_cost': []}
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = map(_run_shard, jobs)
+    else:
+        pool = ProcessPoolExecutor(workers)
+        results = pool.map(_run_shard, jobs, chunksize=2)
+    try:
+        for rules, shard in results:
+            report['states'] += shard['states']
+            for name, n in shard['mismatches'].items():
+                report['mismatches'][name] = report['mismatches'].get(name, 0) + n
+                examples = report['examples'].setdefault(name, [])
+                examples.extend(shard['examples'][name][:MAX_EXAMPLES - len(examples)])
+            for key, n in shard['illegal'].items():
+                report['illegal'][key] = report['illegal'].get(key, 0) + n
+            for key, n in shard['unplayable'].items():
+                report['unplayable'][key] = report['unplayable'].get(key, 0) + n
+            for idx, (basic, best, cost) in shard['cells'].items():
+                report['ev_cost'].append({
+                    'cell': solver.describe_cell(idx), 'rules': dict(rules),
+                    'reference': basic, 'solver': best, 'cost': cost,
+                })
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    report['ev_cost'].sort(key=lambda d: -d['cost'])
+    report['elapsed'] = time.perf_counter() - start
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the strategy functions over every reachable state.")
+    parser.add_argument("--max-cards", type=int, default=5, help="Longest player hand to enumerate")
+    parser.add_argument("--candidate", action="append", default=[],
+                        help="Extra candidate as module:function(player_hand, upcard, rules, true_count)")
+    parser.add_argument("--no-batch", action="store_true", help="Skip the numpy batch candidate")
+    parser.add_argument("-d", "--decks", type=int, default=6, help="Deck count for solver EVs")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--top", type=int, default=15, help="Estimated EV differences to list")
+    parser.add_argument("--report", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = verify(args.max_cards, candidate_specs=args.candidate, num_decks=args.decks,
+                    workers=args.workers, use_batch=False if args.no_batch else None)
+
+    print(f"Checked {report['states']:,} states in {report['elapsed']:.1f} s")
+    failed = False
+    for name, n in report['mismatches'].items():
+        print(f" {name:<20}: {'OK' if not n else f'{n} mismatches'}")
+        for example in report['examples'][name]:
+            print(f"     {example}")
+        failed |= n > 0
+    if report['illegal']:
+        print(f"\nIllegal reference actions ({len(report['illegal'])} cells):")
+        for key in sorted(report['illegal'])[:args.top]:
+            print(f"  {key}")
+    if report['unplayable']:
+        print(f"\nSimulator cells without an action ({len(report['unplayable'])}):")
+        for key in sorted(report['unplayable'])[:args.top]:
+            print(f"  {key}")
+        failed = True
+    total_cost = sum(d['cost'] for d in report['ev_cost'])
+    print(f"\nReference differs from the {args.decks}-deck solver in {len(report['ev_cost'])} cells "
+          f"(summed estimated EV cost {total_cost:.3f}); largest:")
+    for d in report['ev_cost'][:args.top]:
+        print(f"  {d['cell']:<24} {rules_text(d['rules']):<12} reference {d['reference']:<9} solver {d['solver']:<9} -{d['cost']:.4f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())